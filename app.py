@@ -1,53 +1,130 @@
-from flask import Flask,request,render_template
-import numpy as np
-import pandas
-import sklearn
-import pickle
-
-# importing model
-model = pickle.load(open('model.pkl','rb'))
-sc = pickle.load(open('standscaler.pkl','rb'))
-ms = pickle.load(open('minmaxscaler.pkl','rb'))
-
-# creating flask app
-app = Flask(__name__)
-
-@app.route('/')
-def index():
-    return render_template("index.html")
-
-@app.route("/predict",methods=['POST'])
-def predict():
-    N = request.form['Nitrogen']
-    P = request.form['Phosporus']
-    K = request.form['Potassium']
-    temp = request.form['Temperature']
-    humidity = request.form['Humidity']
-    ph = request.form['Ph']
-    rainfall = request.form['Rainfall']
-
-    feature_list = [N, P, K, temp, humidity, ph, rainfall]
-    single_pred = np.array(feature_list).reshape(1, -1)
-
-    scaled_features = ms.transform(single_pred)
-    final_features = sc.transform(scaled_features)
-    prediction = model.predict(final_features)
-
-    crop_dict = {1: "Rice", 2: "Maize", 3: "Jute", 4: "Cotton", 5: "Coconut", 6: "Papaya", 7: "Orange",
-                 8: "Apple", 9: "Muskmelon", 10: "Watermelon", 11: "Mango", 12: "Banana",
-                 13: "Pomegranate", 14: "Lentil", 15: "Blackgram", 16: "Mungbean", 17: "Mothbeans",
-                 18: "Pigeonpeas", 19: "Kidneybeans", 20: "Chickpea", 21: "Coffee"}
-
-    if prediction[0] in crop_dict:
-        crop = crop_dict[prediction[0]]
-        result = "{} is the best crop to be cultivated right there".format(crop)
-    else:
-        result = "Sorry, we could not determine the best crop to be cultivated with the provided data."
-    return render_template('index.html',result = result)
-
-
-
-
-# python main
-if __name__ == "__main__":
-    app.run(debug=True)
\ No newline at end of file
+from flask import Flask,request,render_template,Response,jsonify,g
+import numpy as np
+import pandas
+import io
+import json
+import time
+from utils.predictor import FEATURE_NAMES, get_predictor
+from utils.metrics import registry
+
+# importing model
+predictor = get_predictor()
+
+MAX_BATCH_ROWS = 100000
+DEFAULT_TOP_K = 3
+
+REQUEST_SECONDS = registry.histogram("http_request_seconds", "Seconds to handle a request, by route", ("endpoint",))
+IN_FLIGHT = registry.gauge("http_requests_in_flight", "Requests currently being handled")
+
+# creating flask app
+app = Flask(__name__)
+
+@app.before_request
+def start_timer():
+    g.request_start = time.perf_counter()
+    IN_FLIGHT.inc()
+
+@app.teardown_request
+def stop_timer(exc=None):
+    if 'request_start' in g:
+        IN_FLIGHT.dec()
+        REQUEST_SECONDS.observe(time.perf_counter() - g.request_start, endpoint=request.endpoint or "unknown")
+
+def parse_batch_request():
+    """Read N rows of the seven features from a JSON or CSV request body"""
+    if 'file' in request.files:
+        frame = pandas.read_csv(request.files['file'])
+    elif request.mimetype == 'text/csv':
+        frame = pandas.read_csv(io.BytesIO(request.get_data()))
+    else:
+        payload = request.get_json(silent=True)
+        if isinstance(payload, dict):
+            payload = payload.get('rows')
+        if not isinstance(payload, list) or not payload:
+            raise ValueError("Expected a JSON list of rows or an object with a 'rows' list")
+        if isinstance(payload[0], dict):
+            frame = pandas.DataFrame(payload)
+        else:
+            return np.asarray(payload, dtype=float).reshape(len(payload), -1)
+
+    missing = [name for name in FEATURE_NAMES if name not in frame.columns]
+    if missing:
+        raise ValueError("Missing feature columns: {}".format(", ".join(missing)))
+    return frame[list(FEATURE_NAMES)].to_numpy(dtype=float)
+
+@app.route('/')
+def index():
+    return render_template("index.html")
+
+@app.route("/predict",methods=['POST'])
+def predict():
+    N = request.form['Nitrogen']
+    P = request.form['Phosporus']
+    K = request.form['Potassium']
+    temp = request.form['Temperature']
+    humidity = request.form['Humidity']
+    ph = request.form['Ph']
+    rainfall = request.form['Rainfall']
+
+    feature_list = [N, P, K, temp, humidity, ph, rainfall]
+    single_pred = np.array(feature_list).reshape(1, -1)
+
+    top_k = request.form.get('top_k', DEFAULT_TOP_K, type=int)
+    recommendations = predictor.recommend_one(single_pred, top_k)
+    crop = recommendations[0]['crop']
+
+    if crop:
+        result = "{} is the best crop to be cultivated right there".format(crop)
+    else:
+        result = "Sorry, we could not determine the best crop to be cultivated with the provided data."
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify({"result": result, "recommendations": recommendations})
+    return render_template('index.html',result = result, recommendations = recommendations)
+
+@app.route("/predict_batch",methods=['POST'])
+def predict_batch():
+    try:
+        features = predictor.features_matrix(parse_batch_request())
+    except (ValueError, TypeError, pandas.errors.ParserError) as e:
+        # TypeError: a cell that is a JSON object or list rather than a number
+        return jsonify({"error": str(e)}), 400
+
+    if len(features) > MAX_BATCH_ROWS:
+        return jsonify({"error": "At most {} rows per request".format(MAX_BATCH_ROWS)}), 413
+
+    top_k = request.args.get('top_k', type=int)
+    predictions, probabilities = predictor.predict_with_proba(features)
+    recommendations = predictor.rank(probabilities, top_k) if top_k else None
+    class_names = predictor.class_labels
+    as_csv = request.args.get('format') == 'csv' or request.accept_mimetypes.best == 'text/csv'
+
+    def generate_csv():
+        yield ",".join(["row", "crop_id", "crop"] + [str(name) for name in class_names]) + "\n"
+        for i, (prediction, row) in enumerate(zip(predictions, probabilities)):
+            crop = predictor.label(prediction) or ""
+            yield "{},{},{},{}\n".format(i, prediction, crop, ",".join("{:.4f}".format(p) for p in row))
+
+    def generate_json():
+        for i, (prediction, row) in enumerate(zip(predictions, probabilities)):
+            item = {
+                "row": i,
+                "crop_id": int(prediction),
+                "crop": predictor.label(prediction),
+                "probabilities": {name: round(float(p), 4) for name, p in zip(class_names, row)}
+            }
+            if recommendations:
+                item["recommendations"] = recommendations[i]
+            yield json.dumps(item) + "\n"
+
+    if as_csv:
+        return Response(generate_csv(), mimetype='text/csv')
+    return Response(generate_json(), mimetype='application/x-ndjson')
+
+@app.route("/metrics")
+def metrics():
+    """Prometheus text format: stage timings, upstream calls, cache hit rates"""
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+# python main
+if __name__ == "__main__":
+    app.run(debug=True)
@@ -1,12 +1,18 @@
 import streamlit as st
-import numpy as np
-import pickle
 import os
-from utils.translations import get_text
+import threading
+from utils.translations import available_languages, get_catalog, get_text
 from utils.firebase_auth import init_session_state, login_user, signup_user, logout_user, is_logged_in
-from utils.weather import get_weather_forecast, get_forecast_5day
-from utils.forum import add_forum_post, get_forum_posts
-import requests
+from utils.weather import get_weather_bundle
+from utils.forum import (add_forum_post, add_forum_reply, count_forum_matches, count_forum_posts,
+                         get_forum_posts, search_forum_posts)
+from utils.predictor import get_predictor
+from utils.insight_cache import INSIGHT_CACHE_BUCKETS, insight_cache, prompt_cache_key, quantize_features
+from utils.insight_catalog import insight_catalog
+from utils.inference import collect, stream_insight
+from utils.jobs import job_queue
+from utils.conversation import ConversationContext
+from utils.metrics import registry
 
 st.set_page_config(
     page_title="Smart Crop Recommendation System",
@@ -52,6 +58,13 @@ custom_css = """
         margin: 0.5rem 0;
         border-left: 4px solid #4CAF50;
     }
+    .forum-reply {
+        background-color: #fafafa;
+        padding: 0.5rem 1rem;
+        border-radius: 8px;
+        margin: 0.25rem 0 0.25rem 2rem;
+        border-left: 3px solid #A5D6A7;
+    }
     .crop-result {
         background: linear-gradient(135deg, #11998e 0%, #38ef7d 100%);
         padding: 2rem;
@@ -65,45 +78,60 @@ custom_css = """
 """
 st.markdown(custom_css, unsafe_allow_html=True)
 
-crop_dict = {
-    1: "Rice", 2: "Maize", 3: "Jute", 4: "Cotton", 5: "Coconut", 6: "Papaya", 7: "Orange",
-    8: "Apple", 9: "Muskmelon", 10: "Watermelon", 11: "Grapes", 12: "Mango", 13: "Banana",
-    14: "Pomegranate", 15: "Lentil", 16: "Blackgram", 17: "Mungbean", 18: "Mothbeans",
-    19: "Pigeonpeas", 20: "Kidneybeans", 21: "Chickpea", 22: "Coffee"
-}
-
 @st.cache_resource
-def load_models():
+def load_predictor():
     try:
-        model = pickle.load(open('model.pkl', 'rb'))
-        sc = pickle.load(open('standscaler.pkl', 'rb'))
-        ms = pickle.load(open('minmaxscaler.pkl', 'rb'))
-        return model, sc, ms
+        return get_predictor()
     except FileNotFoundError as e:
         st.error(f"Error loading model files: {str(e)}")
-        return None, None, None
+        return None
 
-def predict_crop(features, model, sc, ms):
+TOP_K_CROPS = 3
+# Sidebar pages by translation key; the radio shows each key's text in the current language
+NAV_PAGES = ('home', 'weather', 'forums', 'ai_chat')
+FORUM_PAGE_SIZE = 15
+# Seconds between checks of a background insight job
+INSIGHT_POLL_SECONDS = 2
+# Logins (comma-separated ADMIN_EMAILS) that see the metrics page
+ADMIN_EMAILS = frozenset(email.strip().casefold() for email in os.getenv("ADMIN_EMAILS", "").split(",") if email.strip())
+
+def is_admin():
+    return (st.session_state.get('user_email') or '').casefold() in ADMIN_EMAILS
+
+def predict_crop(features, predictor):
     try:
-        single_pred = np.array(features).reshape(1, -1)
-        scaled_features = ms.transform(single_pred)
-        final_features = sc.transform(scaled_features)
-        prediction = model.predict(final_features)
-        
-        if prediction[0] in crop_dict:
-            return crop_dict[prediction[0]]
-        return None
+        return predictor.predict_one(features)
     except Exception as e:
         st.error(f"Error making prediction: {str(e)}")
         return None
 
-def ai_recommendations(crop, features, chat_input=None, chat_history=None, lang="en"):
+def recommend_crops(features, predictor, k=TOP_K_CROPS):
+    try:
+        return predictor.recommend_one(features, k)
+    except Exception as e:
+        st.error(f"Error making prediction: {str(e)}")
+        return []
+
+def ai_recommendations(crop, features, chat_input=None, context=None, lang="en", stream=False, cancel=None):
+    """Insight text for crop when it is ready; otherwise the model answer comes back as a generator
+    of text pieces with stream=True, or as a queued Job to poll"""
+    # Crop insights come from the prebuilt catalog; only chat questions go to the model
+    if not chat_input:
+        document = insight_catalog.get(crop, lang)
+        if document:
+            return document
+    
     api_url = "https://api-inference.huggingface.co/models/mistralai/Mistral-Nemo-Instruct-2407"
     api_token = os.getenv("HUGGINGFACE_API_TOKEN")
     
     if not api_token:
         return "AI chatbot not configured. Please add HUGGINGFACE_API_TOKEN."
     
+    # Rounded readings let nearby ones share a cached answer; the prompt then says so
+    parameters_note = ""
+    if INSIGHT_CACHE_BUCKETS:
+        features = quantize_features(features)
+        parameters_note = " (rounded, treat them as approximate)"
     language_instruction = ""
     if lang == "te":
         language_instruction = "Please provide the response in Telugu language."
@@ -120,7 +148,7 @@ def ai_recommendations(crop, features, chat_input=None, chat_history=None, lang=
 
     detailed_prompt = f"""{base_prompt}
 
-    Detailed Soil and Environmental Parameters:
+    Detailed Soil and Environmental Parameters{parameters_note}:
     - Nitrogen: {features[0]:.1f}
     - Phosphorus: {features[1]:.1f}
     - Potassium: {features[2]:.1f}
@@ -132,21 +160,19 @@ def ai_recommendations(crop, features, chat_input=None, chat_history=None, lang=
     Provide comprehensive agricultural insights taking these specific parameters into account."""
 
     if chat_input:
+        if context is not None and len(context):
+            detailed_prompt += f"\n\n{context.render()}"
         detailed_prompt += f"\n\nLatest User Query: {chat_input}"
 
-    headers = {"Authorization": f"Bearer {api_token}"}
-    
-    try:
-        response = requests.post(api_url, headers=headers, json={"inputs": detailed_prompt}, timeout=30)
-        if response.status_code == 200:
-            result = response.json()
-            if isinstance(result, list) and len(result) > 0:
-                return result[0].get("generated_text", "Unable to fetch agricultural insights.")
-            return "Unable to fetch agricultural insights."
-        else:
-            return f"Unable to fetch agricultural insights. Status: {response.status_code}"
-    except Exception as e:
-        return f"Error fetching insights: {str(e)}"
+    cache_key = prompt_cache_key(api_url, detailed_prompt)
+    cached = insight_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    if stream:
+        return stream_insight(api_url, api_token, detailed_prompt, insight_cache, cache_key, cancel)
+
+    return job_queue.submit("insight", cache_key, {"api_url": api_url, "prompt": detailed_prompt, "cache_key": cache_key})
 
 def show_login_page(lang):
     st.markdown(f"<h1 class='main-header'>{get_text(lang, 'app_title')}</h1>", unsafe_allow_html=True)
@@ -186,7 +212,51 @@ def show_login_page(lang):
             else:
                 st.warning("Please enter both email and password")
 
-def show_home_page(lang, model, sc, ms):
+@st.fragment(run_every=INSIGHT_POLL_SECONDS)
+def poll_insight_job(job_key, title):
+    """Placeholder that checks the job every few seconds; once it finishes, a full
+    rerun draws the result without this fragment, which stops the polling"""
+    job = job_queue.get(job_key)
+    if job is None or not job.pending:
+        st.rerun()
+    with st.expander(title, expanded=True):
+        st.info("Generating Agricultural insights...")
+
+def show_insight_job(job_key, title):
+    """Insight panel for a background job: polls while it is pending, then shows the result"""
+    job = job_queue.get(job_key)
+    if job is not None and job.pending:
+        poll_insight_job(job_key, title)
+        return
+    with st.expander(title, expanded=True):
+        if job is not None and job.status == 'done':
+            st.write(job.result)
+        else:
+            st.warning(job.error if job is not None else "Unable to fetch agricultural insights.")
+
+def show_recommendation(lang, recommendation):
+    """Result of the last recommendation; kept in session state so it survives reruns"""
+    recommendations = recommendation['recommendations']
+    result = recommendations[0]['crop']
+    st.markdown(f"""<div class='crop-result'>
+        🌱 {result}
+        <div style='font-size: 1rem;'>{get_text(lang, 'confidence')}: {recommendations[0]['probability']:.0%}</div>
+    </div>""", unsafe_allow_html=True)
+    
+    alternatives = [r for r in recommendations[1:] if r['crop'] and r['probability'] > 0]
+    if alternatives:
+        st.markdown(f"**{get_text(lang, 'other_suitable_crops')}**")
+        for alternative in alternatives:
+            st.progress(alternative['probability'], text=f"{alternative['crop']} — {alternative['probability']:.0%}")
+    
+    title = f"📚 {get_text(lang, 'crop_insights')} - {result}"
+    if recommendation['insight_job'] is None:
+        with st.expander(title, expanded=True):
+            st.write(recommendation['insight'])
+    else:
+        show_insight_job(recommendation['insight_job'], title)
+
+def show_home_page(lang, predictor):
     st.markdown(f"<h2>🌾 {get_text(lang, 'recommended_crop')}</h2>", unsafe_allow_html=True)
     
     col1, col2 = st.columns(2)
@@ -204,25 +274,45 @@ def show_home_page(lang, model, sc, ms):
 
     if st.button(get_text(lang, 'get_recommendation'), type="primary"):
         feature_list = [nitrogen, phosphorus, potassium, temperature, humidity, ph, rainfall]
-        result = predict_crop(feature_list, model, sc, ms)
+        recommendations = recommend_crops(feature_list, predictor)
+        result = recommendations[0]['crop'] if recommendations else None
         if result:
             st.session_state.chat_history = []
+            st.session_state.pop('chat_stream', None)
+            st.session_state.chat_context = ConversationContext()
             st.session_state.current_crop = result
             st.session_state.current_features = feature_list
-            
-            st.markdown(f"""<div class='crop-result'>
-                🌱 {result}
-            </div>""", unsafe_allow_html=True)
-            
-            with st.spinner("Generating Agricultural insights..."):
-                description = ai_recommendations(result, feature_list, lang=lang)
-            with st.expander(f"📚 {get_text(lang, 'crop_insights')} - {result}", expanded=True):
-                st.write(description)
+            # Insights the model still has to write come from a background job, so the result shows at once
+            description = ai_recommendations(result, feature_list, lang=lang)
+            st.session_state.recommendation = {
+                'recommendations': recommendations,
+                'insight': description if isinstance(description, str) else None,
+                'insight_job': None if isinstance(description, str) else description.key,
+            }
+    
+    if st.session_state.get('recommendation'):
+        show_recommendation(lang, st.session_state.recommendation)
     
     if st.session_state.get('current_crop'):
         st.divider()
         st.subheader(f"🤖 {get_text(lang, 'ai_chat')} - {st.session_state.current_crop}")
         
+        context = st.session_state.get('chat_context')
+        if context is None:
+            context = st.session_state.chat_context = ConversationContext.from_history(st.session_state.chat_history)
+        
+        interrupted = st.session_state.pop('chat_stream', None)
+        if interrupted is not None:
+            # A new message arrived while the last answer was still streaming
+            interrupted['cancel'].set()
+            if interrupted['parts']:
+                partial = "".join(interrupted['parts']) + " …"
+                st.session_state.chat_history.append({
+                    'role': 'assistant',
+                    'content': partial
+                })
+                context.add('assistant', partial)
+        
         for msg in st.session_state.get('chat_history', []):
             st.chat_message(msg['role']).write(msg['content'])
         
@@ -234,19 +324,29 @@ def show_home_page(lang, model, sc, ms):
             })
             st.chat_message('user').write(chat_input)
             
-            with st.spinner("Generating response..."):
-                chat_response = ai_recommendations(
-                    st.session_state.current_crop, 
-                    st.session_state.current_features, 
-                    chat_input, 
-                    st.session_state.chat_history,
-                    lang=lang
-                )
-                st.session_state.chat_history.append({
-                    'role': 'assistant',
-                    'content': chat_response
-                })
-                st.chat_message('assistant').write(chat_response)
+            chat_stream = {'cancel': threading.Event(), 'parts': []}
+            st.session_state.chat_stream = chat_stream
+            chat_response = ai_recommendations(
+                st.session_state.current_crop, 
+                st.session_state.current_features, 
+                chat_input, 
+                context,
+                lang=lang,
+                stream=True,
+                cancel=chat_stream['cancel']
+            )
+            context.add('user', chat_input)
+            with st.chat_message('assistant'):
+                if isinstance(chat_response, str):
+                    st.write(chat_response)
+                else:
+                    chat_response = st.write_stream(collect(chat_response, chat_stream['parts']))
+            st.session_state.pop('chat_stream', None)
+            st.session_state.chat_history.append({
+                'role': 'assistant',
+                'content': chat_response
+            })
+            context.add('assistant', chat_response)
 
 def show_weather_page(lang):
     st.markdown(f"<h2>🌤️ {get_text(lang, 'weather')}</h2>", unsafe_allow_html=True)
@@ -254,7 +354,7 @@ def show_weather_page(lang):
     city = st.text_input(get_text(lang, 'weather_location'), value="Hyderabad")
     
     if st.button(get_text(lang, 'get_weather'), type="primary"):
-        weather_info, error = get_weather_forecast(city)
+        weather_info, forecast, error = get_weather_bundle(city)
         
         if weather_info:
             st.markdown(f"""
@@ -269,7 +369,6 @@ def show_weather_page(lang):
             </div>
             """, unsafe_allow_html=True)
             
-            forecast, error = get_forecast_5day(city)
             if forecast:
                 st.subheader("📅 24-Hour Forecast")
                 cols = st.columns(4)
@@ -304,6 +403,7 @@ def show_forum_page(lang):
                 else:
                     success = add_forum_post(name, topic, message)
                     if success:
+                        st.session_state.forum_page = 0
                         st.success("✅ Your post has been added!")
                         st.rerun()
                     else:
@@ -311,8 +411,23 @@ def show_forum_page(lang):
             else:
                 st.warning("Please fill in all fields")
     
-    st.subheader(f"📋 {get_text(lang, 'recent_discussions')}")
-    posts = get_forum_posts(15)
+    query = st.text_input(f"🔍 {get_text(lang, 'search_discussions')}", max_chars=200).strip()
+    if query != st.session_state.get('forum_query', ''):
+        st.session_state.forum_query = query
+        st.session_state.forum_page = 0
+    
+    if query:
+        total = count_forum_matches(query)
+        st.subheader(f"🔍 {get_text(lang, 'search_results')} ({total})")
+    else:
+        total = count_forum_posts()
+        st.subheader(f"📋 {get_text(lang, 'recent_discussions')}")
+    pages = max(1, -(-total // FORUM_PAGE_SIZE))
+    page = min(st.session_state.get('forum_page', 0), pages - 1)
+    if query:
+        posts = search_forum_posts(query, FORUM_PAGE_SIZE, page * FORUM_PAGE_SIZE)
+    else:
+        posts = get_forum_posts(FORUM_PAGE_SIZE, page * FORUM_PAGE_SIZE)
     
     if posts:
         for post in posts:
@@ -323,9 +438,96 @@ def show_forum_page(lang):
                 <p>{post['message']}</p>
             </div>
             """, unsafe_allow_html=True)
+            for reply in post['replies']:
+                st.markdown(f"""
+                <div class='forum-reply'>
+                    <p><strong>↳ {reply['name']}</strong> • <em>{reply['timestamp']}</em></p>
+                    <p>{reply['message']}</p>
+                </div>
+                """, unsafe_allow_html=True)
+            
+            with st.expander(f"↩️ {get_text(lang, 'reply')} ({len(post['replies'])})"):
+                reply_name = st.text_input(get_text(lang, 'your_name'), max_chars=100, key=f"reply_name_{post['id']}")
+                reply_message = st.text_area(get_text(lang, 'your_message'), max_chars=1000, key=f"reply_message_{post['id']}")
+                if st.button(get_text(lang, 'post_reply'), key=f"reply_button_{post['id']}"):
+                    if add_forum_reply(post['id'], reply_name, reply_message):
+                        st.rerun()
+                    else:
+                        st.warning("Name and reply must be at least 2 characters")
+        
+        if pages > 1:
+            col_prev, col_page, col_next = st.columns([1, 2, 1])
+            with col_prev:
+                if st.button(f"⬅️ {get_text(lang, 'newer_posts')}", disabled=page == 0):
+                    st.session_state.forum_page = page - 1
+                    st.rerun()
+            with col_page:
+                st.caption(f"{get_text(lang, 'page')} {page + 1} / {pages}")
+            with col_next:
+                if st.button(f"{get_text(lang, 'older_posts')} ➡️", disabled=page >= pages - 1):
+                    st.session_state.forum_page = page + 1
+                    st.rerun()
+    elif query:
+        st.info(get_text(lang, 'no_search_results'))
     else:
         st.info("No discussions yet. Be the first to post!")
 
+def show_admin_page(lang):
+    st.markdown(f"<h2>📊 {get_text(lang, 'admin')}</h2>", unsafe_allow_html=True)
+    st.caption("Counted since this app process started. The Flask app serves its own numbers at /metrics.")
+    if not registry.enabled:
+        st.info("Metrics are turned off (METRICS_ENABLED=0).")
+        return
+    st.button("🔄 Refresh")
+    
+    snapshot = registry.snapshot()
+    stats = registry.collect_stats()
+    
+    st.subheader("Caches")
+    cache_columns = st.columns(4)
+    for column, (name, title) in zip(cache_columns, (('prediction_cache', "Predictions"), ('insight_cache', "Insights"), ('weather_cache', "Weather"), ('forum_cache', "Forum"))):
+        cache = stats.get(name)
+        if cache:
+            column.metric(f"{title} hit rate", f"{cache['hit_rate']:.0%}", help=f"{cache['hits']} hits, {cache['misses']} misses")
+    
+    st.subheader("Stage latency")
+    stages = snapshot.get('crop_stage_seconds', {})
+    if stages:
+        st.dataframe([{"stage": label.split("=", 1)[1], **summary} for label, summary in stages.items()], hide_index=True)
+    else:
+        st.info("Nothing timed yet.")
+    
+    st.subheader("Upstream calls")
+    llm = stats.get('llm', {})
+    gate_columns = st.columns(4)
+    gate_columns[0].metric("Model calls in flight", llm.get('in_flight', 0))
+    gate_columns[1].metric("Queued", llm.get('queue_depth', 0))
+    gate_columns[2].metric("Coalesced", llm.get('coalesced', 0))
+    gate_columns[3].metric("Model errors", sum(snapshot.get('llm_errors_total', {}).values()))
+    upstream = []
+    requests_by_host = snapshot.get('upstream_requests_total', {})
+    errors_by_host = snapshot.get('upstream_errors_total', {})
+    in_flight_by_host = snapshot.get('upstream_in_flight', {})
+    for label, summary in snapshot.get('upstream_request_seconds', {}).items():
+        host = label.split("=", 1)[1]
+        upstream.append({
+            "host": host,
+            **summary,
+            "errors": errors_by_host.get(label, 0),
+            "in_flight": in_flight_by_host.get(label, 0),
+            "outcomes": ", ".join(f"{key.rsplit('=', 1)[1]}: {count}" for key, count in requests_by_host.items()
+                                  if key.startswith(f"{label},")),
+        })
+    if upstream:
+        st.dataframe(upstream, hide_index=True)
+    
+    jobs = stats.get('jobs')
+    if jobs:
+        st.subheader("Background jobs")
+        job_columns = st.columns(4)
+        for column, status in zip(job_columns, ('queued', 'running', 'done', 'failed')):
+            column.metric(status.capitalize(), jobs.get(status, 0))
+
 def main():
     init_session_state()
     
@@ -342,47 +544,52 @@ def main():
         st.image("https://cdn-icons-png.flaticon.com/512/628/628283.png", width=100)
         st.title("🌱 Menu")
         
+        languages = available_languages()
         lang = st.selectbox(
             "🌐 Language / భాష",
-            options=['en', 'te'],
-            format_func=lambda x: "English" if x == 'en' else "తెలుగు",
-            index=0 if st.session_state.language == 'en' else 1
+            options=languages,
+            format_func=lambda x: get_catalog(x)['language_name'],
+            index=languages.index(st.session_state.language) if st.session_state.language in languages else 0
         )
         st.session_state.language = lang
+        labels = get_catalog(lang)
         
         if is_logged_in():
             st.success(f"✅ Logged in as: {st.session_state.user_email}")
             
             page = st.radio(
                 "Navigation",
-                [get_text(lang, 'home'), get_text(lang, 'weather'), 
-                 get_text(lang, 'forums'), get_text(lang, 'ai_chat')],
+                NAV_PAGES + ('admin',) if is_admin() else NAV_PAGES,
+                format_func=labels.__getitem__,
+                key='nav_page',
                 label_visibility="collapsed"
             )
             
-            if st.button(get_text(lang, 'logout')):
+            if st.button(labels['logout']):
                 logout_user()
                 st.rerun()
         else:
-            page = "Login"
+            page = "login"
     
     if not is_logged_in():
         show_login_page(lang)
     else:
-        model, sc, ms = load_models()
+        predictor = load_predictor()
         
-        if model is None:
+        if predictor is None:
             st.error("Failed to load ML models. Please check model files.")
             return
         
-        if page == get_text(lang, 'home'):
-            show_home_page(lang, model, sc, ms)
-        elif page == get_text(lang, 'weather'):
+        if page == 'home':
+            show_home_page(lang, predictor)
+        elif page == 'weather':
             show_weather_page(lang)
-        elif page == get_text(lang, 'forums'):
+        elif page == 'forums':
             show_forum_page(lang)
-        elif page == get_text(lang, 'ai_chat'):
+        elif page == 'ai_chat':
             st.info("Please get a crop recommendation first from the Home page to start chatting!")
+        elif page == 'admin' and is_admin():
+            show_admin_page(lang)
 
 if __name__ == "__main__":
     main()
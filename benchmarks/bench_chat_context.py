@@ -0,0 +1,79 @@
+"""Prompt context size over a long chat: full history vs ConversationContext.
+
+Replays a synthetic conversation and records, at each turn, the estimated
+tokens of the context block sent with the question and the time spent
+building it. Joining the whole history grows without bound (and the total
+sent over a conversation grows quadratically); the managed context levels
+off at its budget.
+
+Run from the repository root:  python -m benchmarks.bench_chat_context
+"""
+import argparse
+import random
+import time
+
+from utils.conversation import ConversationContext, estimate_tokens
+
+TURNS = 500
+CHECKPOINTS = (1, 10, 50, 100, 250, 500)
+
+QUESTIONS = (
+    "How often should I irrigate during flowering?",
+    "Which fertilizer should I apply after 30 days?",
+    "My leaves are turning yellow at the edges, what could it be?",
+    "Is it too late to sow this month?",
+    "How do I control whitefly without spraying too much?",
+)
+ANSWER_SENTENCES = (
+    "Irrigate lightly every 7 to 10 days, more often on sandy soil.",
+    "Apply the second split of nitrogen when the crop is knee high.",
+    "Yellow edges usually point to potassium deficiency.",
+    "Check the soil moisture before each irrigation.",
+    "Yellow sticky traps help to monitor whitefly numbers.",
+    "Remove badly affected plants to stop the spread.",
+)
+
+
+def full_history(history):
+    return "\n".join(f"{message['role']}: {message['content']}" for message in history)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=TURNS)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    history = []
+    context = ConversationContext()
+    totals = {"full": 0, "managed": 0}
+    checkpoints = set(CHECKPOINTS) | {args.turns}
+
+    print(f"{'turn':>5} {'full ctx tokens':>16} {'managed ctx tokens':>19} {'full build (µs)':>16} {'managed build (µs)':>19}")
+    for turn in range(1, args.turns + 1):
+        question = rng.choice(QUESTIONS)
+        answer = " ".join(rng.choices(ANSWER_SENTENCES, k=rng.randint(3, 8)))
+
+        start = time.perf_counter()
+        full = full_history(history)
+        full_us = (time.perf_counter() - start) * 1e6
+        start = time.perf_counter()
+        managed = context.render()
+        managed_us = (time.perf_counter() - start) * 1e6
+
+        full_tokens, managed_tokens = estimate_tokens(full), estimate_tokens(managed)
+        totals["full"] += full_tokens
+        totals["managed"] += managed_tokens
+        if turn in checkpoints:
+            print(f"{turn:>5} {full_tokens:>16} {managed_tokens:>19} {full_us:>16.1f} {managed_us:>19.1f}")
+
+        for role, content in (("user", question), ("assistant", answer)):
+            history.append({"role": role, "content": content})
+            context.add(role, content)
+
+    print(f"\ntotal context tokens sent over {args.turns} turns: "
+          f"full {totals['full']:,}, managed {totals['managed']:,}")
+
+
+if __name__ == "__main__":
+    main()
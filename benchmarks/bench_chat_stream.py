@@ -0,0 +1,129 @@
+"""Time to first token for the chat assistant: blocking vs streaming.
+
+A local fake inference server mimics the Hugging Face endpoint. It spends a
+fixed "prefill" delay and then one delay per generated token. For
+"stream": true it sends each token as a server-sent event over a chunked
+response; otherwise it answers with the complete generated_text at the end.
+The cancellation check stops reading after a few tokens and confirms that
+the server sees the connection close instead of generating the whole answer.
+
+Run from the repository root:  python -m benchmarks.bench_chat_stream
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from utils.http_client import http_client
+from utils.inference import stream_generated_text
+
+PREFILL_SECONDS = 0.3
+TOKEN_SECONDS = 0.01
+TOKENS = 150
+ROUNDS = 5
+CANCEL_AFTER = 10
+
+
+class FakeInferenceHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    tokens_sent = []
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        words = [f"word{i} " for i in range(TOKENS)]
+        time.sleep(PREFILL_SECONDS)
+
+        if not body.get("stream"):
+            time.sleep(TOKEN_SECONDS * TOKENS)
+            payload = json.dumps([{"generated_text": "".join(words)}]).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        sent = 0
+        try:
+            for i, word in enumerate(words):
+                last = i == len(words) - 1
+                event = {"token": {"id": i, "text": word, "special": False},
+                         "generated_text": "".join(words) if last else None}
+                data = f"data:{json.dumps(event)}\n\n".encode()
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+                sent += 1
+                time.sleep(TOKEN_SECONDS)
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            FakeInferenceHandler.tokens_sent.append(sent)
+        self.close_connection = True
+
+
+def blocking(url):
+    start = time.perf_counter()
+    response = http_client.post(url, json={"inputs": "question"})
+    response.json()[0]["generated_text"]
+    elapsed = time.perf_counter() - start
+    return elapsed, elapsed
+
+
+def streaming(url):
+    start = time.perf_counter()
+    first = None
+    for _ in stream_generated_text(url, "token", "question"):
+        if first is None:
+            first = time.perf_counter() - start
+    return first, time.perf_counter() - start
+
+
+def cancelled(url):
+    cancel = threading.Event()
+    received = 0
+    for _ in stream_generated_text(url, "token", "question", cancel=cancel):
+        received += 1
+        if received == CANCEL_AFTER:
+            cancel.set()
+    return received
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=ROUNDS)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeInferenceHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/models/fake"
+
+    print(f"{TOKENS} tokens, {PREFILL_SECONDS * 1000:.0f} ms prefill, {TOKEN_SECONDS * 1000:.0f} ms per token\n")
+    print(f"{'mode':>10} {'first text p50 (ms)':>20} {'complete p50 (ms)':>18}")
+    for name, run in (("blocking", blocking), ("streaming", streaming)):
+        results = np.array([run(url) for _ in range(args.rounds)]) * 1000
+        print(f"{name:>10} {np.median(results[:, 0]):>20.0f} {np.median(results[:, 1]):>18.0f}")
+
+    FakeInferenceHandler.tokens_sent.clear()
+    received = cancelled(url)
+    # Give the handler a moment to notice the closed socket
+    deadline = time.monotonic() + 5
+    while not FakeInferenceHandler.tokens_sent and time.monotonic() < deadline:
+        time.sleep(0.01)
+    sent = FakeInferenceHandler.tokens_sent[0] if FakeInferenceHandler.tokens_sent else None
+    print(f"\ncancel after {CANCEL_AFTER} tokens: received {received}, server sent {sent} of {TOKENS}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Compare FlatForest with sklearn's RandomForestClassifier on model.pkl.
+
+Run from the repository root:  python -m benchmarks.bench_forest
+"""
+import pickle
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from utils.forest import FlatForest
+from utils.preprocessing import load_scaler
+
+BATCH_SIZES = (1, 10, 100, 1000, 10000, 50000)
+
+
+def time_calls(fn, X, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(X)
+        timings.append(time.perf_counter() - start)
+    return np.array(timings)
+
+
+def main():
+    warnings.simplefilter("ignore")
+    with open("model.pkl", "rb") as f:
+        model = pickle.load(f)
+    flat = FlatForest.from_sklearn(model)
+
+    features = pd.read_csv("Crop_recommendation.csv").drop(columns=["label"]).to_numpy(dtype=float)
+    X = load_scaler().transform(features)
+    rng = np.random.default_rng(0)
+    noise = rng.uniform(X.min(axis=0), X.max(axis=0), size=(20000, X.shape[1]))
+
+    for name, data in (("dataset", X), ("uniform noise", noise)):
+        same_proba = np.array_equal(model.predict_proba(data), flat.predict_proba(data))
+        same_label = np.array_equal(model.predict(data), flat.predict(data))
+        print(f"{name:>14}: predict_proba identical={same_proba} predict identical={same_label}")
+        assert same_proba and same_label
+
+    print(f"\n{flat.n_estimators} trees, {flat.node_count} nodes, max depth {flat.max_depth}")
+    print("\nsingle row latency (us)")
+    print(f"{'engine':>8} {'p50':>10} {'p90':>10} {'p99':>10}")
+    for name, fn in (("sklearn", model.predict), ("flat", flat.predict)):
+        timings = np.concatenate([time_calls(fn, X[i:i + 1], 1) for i in rng.integers(0, len(X), 300)]) * 1e6
+        p50, p90, p99 = np.percentile(timings, [50, 90, 99])
+        print(f"{name:>8} {p50:>10.1f} {p90:>10.1f} {p99:>10.1f}")
+
+    print("\nbatch throughput (rows/s)")
+    print(f"{'rows':>8} {'sklearn':>12} {'flat':>12} {'speedup':>8}")
+    batches = np.concatenate([X, noise, X, noise, X, noise])
+    for size in BATCH_SIZES:
+        batch = batches[:size]
+        repeat = max(3, 2000 // size)
+        sk_time = np.median(time_calls(model.predict_proba, batch, repeat))
+        flat_time = np.median(time_calls(flat.predict_proba, batch, repeat))
+        print(f"{size:>8} {size / sk_time:>12.0f} {size / flat_time:>12.0f} {sk_time / flat_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
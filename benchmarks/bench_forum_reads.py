@@ -0,0 +1,125 @@
+"""Forum page rerun latency with many concurrent Streamlit sessions.
+
+Every session is a thread that repeatedly does what one rerun of the forum
+page does: count the posts and read the first page. Modes compared:
+
+  json     parse the legacy forum_data.json on every rerun (the old path)
+  sqlite   query the SQLite store on every rerun
+  cached   SQLite store with the shared in-process read cache
+
+A background writer adds a post now and then, so the cached mode also pays
+for invalidation.
+
+Run from the repository root:  python -m benchmarks.bench_forum_reads
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from utils.forum import ForumStore, load_forum_data
+
+SESSIONS = 200
+RERUNS = 20
+PAGE_SIZE = 15
+POSTS = 100
+WRITE_INTERVAL = 0.05
+
+
+def seed(path, json_path, posts):
+    store = ForumStore(path, max_posts=None, legacy_path=None)
+    legacy = []
+    for i in range(posts):
+        post_id = store.add_post(f"Farmer {i}", f"Topic number {i}", "Sharing what worked on my field this season. " * 5)
+        store.add_reply(post_id, "Neighbour", "Thanks, this helped.")
+        legacy.insert(0, {"id": i + 1, "name": f"Farmer {i}", "topic": f"Topic number {i}",
+                          "message": "Sharing what worked on my field this season. " * 5,
+                          "timestamp": "2024-01-01 00:00:00", "replies": []})
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(legacy, f, ensure_ascii=False, indent=2)
+
+
+def run(mode, path, json_path, sessions, reruns):
+    if mode == "json":
+        def rerun():
+            posts = load_forum_data(json_path)
+            return len(posts), posts[:PAGE_SIZE]
+        store = None
+    else:
+        store = ForumStore(path, max_posts=None, legacy_path=None, read_cache=mode == "cached")
+
+        def rerun():
+            return store.count_posts(), store.get_posts(PAGE_SIZE)
+
+    latencies = [[] for _ in range(sessions)]
+    stop = threading.Event()
+    start_barrier = threading.Barrier(sessions + 1)
+
+    def session(i):
+        start_barrier.wait()
+        for _ in range(reruns):
+            start = time.perf_counter()
+            rerun()
+            latencies[i].append(time.perf_counter() - start)
+
+    def writer():
+        # A separate store stands in for another app process posting
+        other = ForumStore(path, max_posts=None, legacy_path=None)
+        while not stop.wait(WRITE_INTERVAL):
+            other.add_post("Writer", "Background topic", "A post made while sessions are reading.")
+
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(sessions)]
+    for thread in threads:
+        thread.start()
+    writer_thread = threading.Thread(target=writer)
+    if mode != "json":
+        writer_thread.start()
+    start = time.perf_counter()
+    start_barrier.wait()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    if writer_thread.is_alive():
+        writer_thread.join()
+
+    ms = np.concatenate([np.array(l) for l in latencies]) * 1000
+    result = {
+        "mode": mode,
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "reruns_per_s": len(ms) / elapsed,
+    }
+    if store is not None and store.read_cache:
+        result["hit_rate"] = store.cache_stats()["hit_rate"]
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=SESSIONS)
+    parser.add_argument("--reruns", type=int, default=RERUNS)
+    parser.add_argument("--posts", type=int, default=POSTS)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "forum.db")
+        json_path = os.path.join(tmp, "forum_data.json")
+        seed(path, json_path, args.posts)
+
+        print(f"{args.sessions} sessions x {args.reruns} reruns, {args.posts} posts, page of {PAGE_SIZE}\n")
+        print(f"{'mode':>7} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9} {'reruns/s':>10} {'hit rate':>9}")
+        for mode in ("json", "sqlite", "cached"):
+            r = run(mode, path, json_path, args.sessions, args.reruns)
+            hit_rate = f"{r['hit_rate']:.1%}" if "hit_rate" in r else "-"
+            print(f"{mode:>7} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} {r['p99_ms']:>9.2f} "
+                  f"{r['reruns_per_s']:>10.0f} {hit_rate:>9}")
+
+
+if __name__ == "__main__":
+    main()
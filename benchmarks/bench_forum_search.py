@@ -0,0 +1,98 @@
+"""Forum keyword search latency on a large synthetic forum.
+
+Seeds tens of thousands of posts from a small farming vocabulary, then times
+ranked, paginated searches (read cache off, so every query hits FTS5) for
+rare words, common words, multi-word queries, prefixes and deep pages. A
+few Telugu posts check that a word is indexed whole, so "వరి" (rice) does
+not match "వర్షం" (rain).
+
+Run from the repository root:  python -m benchmarks.bench_forum_search
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from utils.forum import ForumStore, now_timestamp
+
+POSTS = 30000
+REPEATS = 200
+PAGE_SIZE = 15
+
+WORDS = (
+    "rice maize cotton jute banana mango coffee lentil chickpea pigeonpeas soil rain irrigation "
+    "fertilizer urea compost pest aphid harvest yield seed sowing nitrogen phosphorus potassium "
+    "drip canal monsoon drought market price loan tractor weeding mulch organic ph salinity"
+).split()
+RARE_WORDS = ("vermicompost", "stemborer", "azolla")
+
+QUERIES = (
+    ("rare word", "vermicompost", 0),
+    ("common word", "rice", 0),
+    ("two words", "rice fertilizer", 0),
+    ("prefix", "irrig", 0),
+    ("deep page", "rice", 600),
+    ("no match", "blockchain", 0),
+)
+
+# (topic, message, queries that must find it); the first two words share the prefix "వర"
+TELUGU_POSTS = (
+    ("వరి సాగు", "వరి నాట్లకు ఎరువులు ఎప్పుడు వేయాలి", ("వరి", "ఎరువులు", "వరి ఎరు")),
+    ("వర్షం", "ఈ వారం వర్షం ఎక్కువగా పడింది", ("వర్షం", "వర్ష")),
+)
+
+
+def seed(store, posts, rng):
+    rows = []
+    for i in range(posts):
+        words = rng.choices(WORDS, k=30)
+        if i % 500 == 0:
+            words.append(rng.choice(RARE_WORDS))
+        rows.append((f"Farmer {i}", " ".join(words[:5]).capitalize(), " ".join(words[5:]), now_timestamp()))
+    conn = store._connect()
+    conn.execute("BEGIN IMMEDIATE")
+    conn.executemany("INSERT INTO posts (name, topic, message, timestamp) VALUES (?, ?, ?, ?)", rows)
+    conn.execute("COMMIT")
+
+
+def check_telugu(store):
+    ids = {store.add_post("Telugu check", topic, message): queries for topic, message, queries in TELUGU_POSTS}
+    for post_id, queries in ids.items():
+        for query in queries:
+            found = [post["id"] for post in store.search(query, PAGE_SIZE)]
+            print(f"{query:>12} -> posts {found}")
+            assert found == [post_id], f"{query!r} matched posts {found}, expected only {post_id}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--posts", type=int, default=POSTS)
+    parser.add_argument("--repeats", type=int, default=REPEATS)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ForumStore(os.path.join(tmp, "forum.db"), legacy_path=None, read_cache=False)
+        start = time.perf_counter()
+        seed(store, args.posts, random.Random(0))
+        print(f"Seeded {args.posts} posts in {time.perf_counter() - start:.2f}s, page of {PAGE_SIZE}\n")
+
+        print(f"{'query':>12} {'matches':>8} {'p50 (ms)':>9} {'p95 (ms)':>9}")
+        for name, query, offset in QUERIES:
+            timings = []
+            for _ in range(args.repeats):
+                start = time.perf_counter()
+                store.search(query, PAGE_SIZE, offset)
+                timings.append(time.perf_counter() - start)
+            ms = np.array(timings) * 1000
+            matches = store.count_matches(query)
+            print(f"{name:>12} {matches:>8} {np.percentile(ms, 50):>9.3f} {np.percentile(ms, 95):>9.3f}")
+
+        print("\nTelugu words are indexed whole:")
+        check_telugu(store)
+
+
+if __name__ == "__main__":
+    main()
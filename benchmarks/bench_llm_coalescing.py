@@ -0,0 +1,94 @@
+"""Upstream model requests for a burst of sessions: identical and distinct prompts.
+
+A classroom of farmers pressing "Get Recommendation" with the same default
+values sends the same prompt from every session at once. This fires CALLERS
+concurrent stream_insight calls at the local fake inference server from
+bench_chat_stream and reports how many requests reached it, the highest
+number it served at the same time, and the gate's queue metrics. With
+distinct prompts there is nothing to share, and the semaphore caps the
+concurrency at LLM_MAX_CONCURRENT instead.
+
+Run from the repository root:  python -m benchmarks.bench_llm_coalescing
+"""
+import argparse
+import threading
+import time
+from http.server import ThreadingHTTPServer
+
+from benchmarks import bench_chat_stream
+from benchmarks.bench_chat_stream import FakeInferenceHandler
+from utils.inference import InferenceGate, stream_insight
+import utils.inference
+
+CALLERS = 50
+TOKENS = 40
+
+
+class CountingHandler(FakeInferenceHandler):
+    lock = threading.Lock()
+    requests = 0
+    active = 0
+    max_active = 0
+
+    def do_POST(self):
+        with CountingHandler.lock:
+            CountingHandler.requests += 1
+            CountingHandler.active += 1
+            CountingHandler.max_active = max(CountingHandler.max_active, CountingHandler.active)
+        try:
+            super().do_POST()
+        finally:
+            with CountingHandler.lock:
+                CountingHandler.active -= 1
+
+    @classmethod
+    def reset(cls):
+        cls.requests = cls.active = cls.max_active = 0
+
+
+def burst(url, callers, same_prompt):
+    answers = [None] * callers
+    barrier = threading.Barrier(callers)
+
+    def session(i):
+        prompt = "Provide guidance for rice" if same_prompt else f"Provide guidance for rice, field {i}"
+        barrier.wait()
+        answers[i] = "".join(stream_insight(url, "token", prompt, cache_key=prompt))
+
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(callers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, answers
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--callers", type=int, default=CALLERS)
+    args = parser.parse_args()
+
+    bench_chat_stream.TOKENS = TOKENS
+    server = ThreadingHTTPServer(("127.0.0.1", 0), CountingHandler)
+    server.request_queue_size = args.callers
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/models/fake"
+
+    print(f"{args.callers} concurrent sessions, {TOKENS} tokens per answer\n")
+    print(f"{'prompts':>10} {'wall (s)':>9} {'upstream':>9} {'max concurrent':>15} "
+          f"{'coalesced':>10} {'max queue':>10} {'wait p95 (ms)':>14}")
+    for same_prompt in (True, False):
+        utils.inference.inference_gate = gate = InferenceGate()
+        CountingHandler.reset()
+        elapsed, answers = burst(url, args.callers, same_prompt)
+        assert all(answer and answer.startswith("word0 ") for answer in answers), "a session got no answer"
+        stats = gate.stats()
+        print(f"{'identical' if same_prompt else 'distinct':>10} {elapsed:>9.2f} {CountingHandler.requests:>9} "
+              f"{CountingHandler.max_active:>15} {stats['coalesced']:>10} {stats['max_queue_depth']:>10} "
+              f"{stats.get('wait_ms_p95', 0):>14.0f}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Cold-start time and per-worker memory: pickled models vs the mapped artifact.
+
+Each mode starts several worker processes at once. Every worker loads the
+models, scores one row and then idles, so the parent can read its resident
+set (RSS) and proportional set (PSS, shared pages split between workers)
+from /proc before shutting it down.
+
+Run from the repository root:  python -m benchmarks.bench_model_load
+"""
+import json
+import subprocess
+import sys
+
+import numpy as np
+
+from utils.model_store import ARTIFACT_DIR, load_cached_artifact
+
+WORKERS = 4
+ROUNDS = 3
+
+WORKER_CODE = {
+    "pickle": """
+import pickle
+with open('model.pkl', 'rb') as f:
+    model = pickle.load(f)
+with open('minmaxscaler.pkl', 'rb') as f:
+    ms = pickle.load(f)
+with open('standscaler.pkl', 'rb') as f:
+    sc = pickle.load(f)
+model.predict(sc.transform(ms.transform([[90, 42, 43, 20.8, 82, 6.5, 202.9]])))
+""",
+    "artifact": """
+from utils.model_store import load_artifact
+model, scaler = load_artifact({path!r})
+model.predict(scaler.transform([[90, 42, 43, 20.8, 82, 6.5, 202.9]]))
+""",
+}
+
+WORKER_TEMPLATE = """
+import time, json, sys, warnings
+warnings.simplefilter('ignore')
+start = time.perf_counter()
+{body}
+print(json.dumps({{"load_seconds": time.perf_counter() - start}}), flush=True)
+sys.stdin.read()
+"""
+
+
+def memory_kb(pid):
+    usage = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if key in ("Rss", "Pss"):
+                    usage[key.lower()] = int(rest.split()[0])
+    except OSError:
+        pass
+    return usage
+
+
+def run_workers(mode):
+    code = WORKER_TEMPLATE.format(body=WORKER_CODE[mode].format(path=ARTIFACT_DIR))
+    workers = [
+        subprocess.Popen([sys.executable, "-c", code], stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+        for _ in range(WORKERS)
+    ]
+    results = []
+    for worker in workers:
+        results.append(json.loads(worker.stdout.readline()))
+    for worker, result in zip(workers, results):
+        result.update(memory_kb(worker.pid))
+    for worker in workers:
+        worker.stdin.close()
+        worker.wait()
+    return results
+
+
+def main():
+    load_cached_artifact()
+    print(f"{WORKERS} concurrent workers x {ROUNDS} rounds per mode\n")
+    print(f"{'mode':>9} {'load p50 (ms)':>14} {'load max (ms)':>14} {'RSS (MB)':>10} {'PSS (MB)':>10}")
+    for mode in ("pickle", "artifact"):
+        results = [result for _ in range(ROUNDS) for result in run_workers(mode)]
+        load_ms = np.array([r["load_seconds"] for r in results]) * 1000
+        rss = np.mean([r.get("rss", np.nan) for r in results]) / 1024
+        pss = np.mean([r.get("pss", np.nan) for r in results]) / 1024
+        print(f"{mode:>9} {np.median(load_ms):>14.1f} {load_ms.max():>14.1f} {rss:>10.1f} {pss:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Single-reading prediction latency with and without the prediction cache.
+
+Readings are the dataset rows rounded to the input forms' precision, drawn
+with a Zipf-like skew so some come up far more often than others, as field
+readings do. Every session is a thread that makes one prediction per rerun.
+Modes compared:
+
+  uncached     scalers and forest on every call (predictor.predict_labels)
+  lru          predict_one with an empty cache
+  precomputed  predict_one after pinning the most frequent readings
+
+Run from the repository root:  python -m benchmarks.bench_prediction_cache
+"""
+import argparse
+import threading
+import time
+import warnings
+
+import numpy as np
+
+from utils.model_store import load_cached_artifact
+from utils.prediction_cache import FEATURE_DECIMALS, frequent_readings, read_readings
+from utils.predictor import CropPredictor
+
+SESSIONS = 8
+CALLS = 20000
+ZIPF_A = 1.3
+PRECOMPUTE_TOP = 500
+
+
+def readings(path, calls, seed=0):
+    scale = np.power(10.0, FEATURE_DECIMALS)
+    rows = np.unique(np.round(read_readings(path) * scale) / scale, axis=0)
+    rng = np.random.default_rng(seed)
+    rng.shuffle(rows)
+    # Rank r is drawn with probability ~ 1 / r^a, folded onto the available rows
+    return rows[(rng.zipf(ZIPF_A, calls) - 1) % len(rows)]
+
+
+def replay(fn, rows, sessions):
+    timings = [None] * sessions
+    chunks = np.array_split(rows, sessions)
+
+    def session(i):
+        times = []
+        for row in chunks[i]:
+            start = time.perf_counter()
+            fn(row)
+            times.append(time.perf_counter() - start)
+        timings[i] = times
+
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(sessions)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return np.concatenate(timings) * 1e6, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data", default="Crop_recommendation.csv")
+    parser.add_argument("--calls", type=int, default=CALLS)
+    parser.add_argument("--sessions", type=int, default=SESSIONS)
+    args = parser.parse_args()
+
+    warnings.simplefilter("ignore")
+    model, scaler = load_cached_artifact()
+    rows = readings(args.data, args.calls)
+    print(f"{len(rows)} predictions over {len(np.unique(rows, axis=0))} distinct readings, "
+          f"{args.sessions} sessions\n")
+
+    print(f"{'mode':>12} {'p50 us':>8} {'p95 us':>8} {'p99 us':>8} {'calls/s':>9} {'hit rate':>9}")
+    for mode in ("uncached", "lru", "precomputed"):
+        predictor = CropPredictor(model, scaler)
+        if mode == "uncached":
+            fn = predictor.predict_labels
+        else:
+            fn = predictor.predict_one
+        if mode == "precomputed":
+            predictor.cache.precompute(frequent_readings(rows[:len(rows) // 2], PRECOMPUTE_TOP)[0])
+        micros, seconds = replay(fn, rows, args.sessions)
+        p50, p95, p99 = np.percentile(micros, (50, 95, 99))
+        hit_rate = predictor.cache.stats()["hit_rate"] if mode != "uncached" else 0.0
+        print(f"{mode:>12} {p50:>8.1f} {p95:>8.1f} {p99:>8.1f} {len(rows) / seconds:>9.0f} {hit_rate:>9.1%}")
+
+    # Memoized answers must match the forest exactly
+    predictor = CropPredictor(model, scaler)
+    sample = np.unique(rows, axis=0)
+    assert [predictor.predict_one(row) for row in sample] == predictor.predict_labels(sample)
+    print("\nmemoized predictions identical to the forest: True")
+
+
+if __name__ == "__main__":
+    main()
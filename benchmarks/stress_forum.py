@@ -0,0 +1,92 @@
+"""Concurrent-writer stress test for the SQLite forum store.
+
+Several processes, each running a few threads, post and reply to one
+database at the same time. Afterwards every write must be present exactly
+once, and the ids handed out must be unique and increasing in commit order.
+
+Run from the repository root:  python -m benchmarks.stress_forum
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+from multiprocessing import Pool
+
+from utils.forum import ForumStore
+
+PROCESSES = 4
+THREADS = 4
+POSTS_PER_THREAD = 50
+
+
+def write_posts(args):
+    path, worker, threads, posts_per_thread = args
+    store = ForumStore(path, max_posts=None, legacy_path=None)
+    # Ids per thread, in the order that thread committed them
+    ids = [[] for _ in range(threads)]
+    errors = []
+    lock = threading.Lock()
+
+    def run(thread):
+        for i in range(posts_per_thread):
+            try:
+                post_id = store.add_post(f"writer {worker}.{thread}", "Stress test topic", f"message number {i}")
+                store.add_reply(post_id, f"writer {worker}.{thread}", f"reply to {i}")
+                ids[thread].append(post_id)
+            except Exception as e:
+                with lock:
+                    errors.append(repr(e))
+
+    start = time.perf_counter()
+    workers = [threading.Thread(target=run, args=(t,)) for t in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return ids, errors, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--processes", type=int, default=PROCESSES)
+    parser.add_argument("--threads", type=int, default=THREADS)
+    parser.add_argument("--posts", type=int, default=POSTS_PER_THREAD, help="posts per thread")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "forum.db")
+        ForumStore(path, max_posts=None, legacy_path=None).count_posts()
+
+        start = time.perf_counter()
+        with Pool(args.processes) as pool:
+            results = pool.map(
+                write_posts, [(path, w, args.threads, args.posts) for w in range(args.processes)]
+            )
+        elapsed = time.perf_counter() - start
+
+        store = ForumStore(path, max_posts=None, legacy_path=None)
+        expected = args.processes * args.threads * args.posts
+        thread_ids = [thread_ids for worker_ids, _, _ in results for thread_ids in worker_ids]
+        ids = [post_id for post_ids in thread_ids for post_id in post_ids]
+        errors = [error for _, worker_errors, _ in results for error in worker_errors]
+        posts = store.get_posts(limit=expected + 1)
+
+        print(f"{args.processes} processes x {args.threads} threads x {args.posts} posts (+1 reply each)")
+        print(f"{expected * 2} writes in {elapsed:.2f}s ({expected * 2 / elapsed:.0f} writes/s)")
+        print(f"errors: {len(errors)}")
+        for error in errors[:5]:
+            print(f"  {error}")
+
+        assert not errors, "writers raised errors"
+        assert len(ids) == len(set(ids)) == expected, "duplicate or missing post ids"
+        assert len(posts) == store.count_posts() == expected, "stored post count does not match"
+        assert all(len(post["replies"]) == 1 for post in posts), "a post lost its reply"
+        assert sorted(post["id"] for post in posts) == sorted(ids), "stored posts do not match the returned ids"
+        assert all(all(a < b for a, b in zip(post_ids, post_ids[1:])) for post_ids in thread_ids), \
+            "a writer got an id lower than one it committed earlier"
+        print("OK: no lost writes, ids unique and increasing")
+
+
+if __name__ == "__main__":
+    main()
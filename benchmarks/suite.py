@@ -0,0 +1,452 @@
+"""Benchmark suite for every prediction path and the forum store, written as JSON.
+
+Replays Crop_recommendation.csv (rows shuffled with a fixed seed) through:
+- the raw pickled pipeline (MinMax scaler, standard scaler, model.predict);
+- the shared CropPredictor;
+- predict_crop in st_app.py and app_enhanced.py;
+- recommend_crops in app_enhanced.py;
+- Flask's /predict and /predict_batch, through the test client.
+
+It reports single-row latency percentiles, batch throughput across batch
+sizes, cold-start time and peak RSS of a fresh process per path, and forum
+save/load timings at growing sizes (the legacy JSON file and forum.db).
+
+The JSON result records the commit and library versions. Pass an earlier
+result to --compare to list the metrics that moved by more than the
+threshold.
+
+Run from the repository root:
+    python -m benchmarks.suite --out bench-results.json
+    python -m benchmarks.suite --quick --compare bench-results.json
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+
+import numpy as np
+
+DATASET_FILE = "Crop_recommendation.csv"
+SEED = 0
+WARMUP_CALLS = 20
+BATCH_SIZES = (1, 10, 100, 1000, 10000)
+# Keep timing a batch size until this much time has been spent on it
+BATCH_MIN_SECONDS = 0.5
+FORUM_SIZES = (100, 1000, 10000)
+FORUM_CALLS = 50
+FORUM_FILE_ROUNDS = 5
+COLD_START_ROUNDS = 5
+FORUM_PAGE_SIZE = 15
+REGRESSION_THRESHOLD = 0.10
+# Smaller differences in a latency are not reported, however large relative to it
+REGRESSION_MIN_DELTA_MS = 0.05
+
+QUICK = {
+    "latency_rows": 300,
+    "batch_sizes": (1, 100, 1000),
+    "batch_min_seconds": 0.1,
+    "forum_sizes": (100, 1000),
+    "cold_start_rounds": 2,
+}
+
+COLD_START_CODE = {
+    "raw_model": """
+import pickle
+with open('model.pkl', 'rb') as f:
+    model = pickle.load(f)
+with open('minmaxscaler.pkl', 'rb') as f:
+    ms = pickle.load(f)
+with open('standscaler.pkl', 'rb') as f:
+    sc = pickle.load(f)
+model.predict(sc.transform(ms.transform([ROW])))
+""",
+    "predictor": """
+from utils.predictor import get_predictor
+get_predictor().predict([ROW])
+""",
+    "flask_app": """
+import app
+app.app.test_client().post('/predict', data=dict(zip(FORM_FIELDS, ROW)), headers={'Accept': 'application/json'})
+""",
+    "app_enhanced": """
+import streamlit.logger
+streamlit.logger.set_log_level('error')
+import app_enhanced
+from utils.predictor import get_predictor
+app_enhanced.recommend_crops(ROW, get_predictor())
+""",
+}
+
+# ru_maxrss survives fork and exec on Linux, so a child would report the suite's
+# own peak; VmHWM is the high-water mark of this process image only
+COLD_START_TEMPLATE = """
+import json, resource, time, warnings
+warnings.simplefilter('ignore')
+ROW = {row!r}
+FORM_FIELDS = {form_fields!r}
+start = time.perf_counter()
+{code}
+elapsed = time.perf_counter() - start
+def peak_rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+print(json.dumps({{"seconds": elapsed, "peak_rss_mb": peak_rss_mb()}}))
+"""
+
+# Form field names of app.py's /predict, in FEATURE_NAMES order
+FORM_FIELDS = ("Nitrogen", "Phosporus", "Potassium", "Temperature", "Humidity", "Ph", "Rainfall")
+
+
+def summarize(seconds):
+    """Latency percentiles in milliseconds"""
+    ms = np.asarray(seconds) * 1000
+    p50, p95, p99 = np.percentile(ms, (50, 95, 99))
+    return {
+        "count": int(len(ms)),
+        "mean_ms": float(ms.mean()),
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "max_ms": float(ms.max()),
+    }
+
+
+def time_each(fn, items):
+    timings = []
+    for item in items:
+        start = time.perf_counter()
+        fn(item)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process in MB (VmHWM, or ru_maxrss without /proc)"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def load_dataset(path=DATASET_FILE):
+    import pandas as pd
+
+    from utils.predictor import FEATURE_NAMES
+
+    frame = pd.read_csv(path)
+    features = frame[list(FEATURE_NAMES)].to_numpy(dtype=float)
+    order = np.random.default_rng(SEED).permutation(len(features))
+    return features[order], frame["label"].nunique()
+
+
+def environment():
+    import sklearn
+
+    def git(*args):
+        try:
+            return subprocess.run(["git", *args], capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    status = git("status", "--porcelain", "--untracked-files=no")
+    return {
+        "commit": git("rev-parse", "HEAD"),
+        "dirty": bool(status) if status is not None else None,
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "sklearn": sklearn.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def load_raw_pipeline():
+    import pickle
+
+    loaded = []
+    for name in ("model.pkl", "minmaxscaler.pkl", "standscaler.pkl"):
+        with open(name, "rb") as f:
+            loaded.append(pickle.load(f))
+    model, ms, sc = loaded
+    return lambda X: model.predict(sc.transform(ms.transform(X)))
+
+
+def bench_cold_start(row, rounds):
+    results = {}
+    for name, code in COLD_START_CODE.items():
+        script = COLD_START_TEMPLATE.format(row=[float(v) for v in row], form_fields=FORM_FIELDS, code=code)
+        samples = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            completed = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True)
+            process_seconds = time.perf_counter() - start
+            if completed.returncode != 0:
+                raise RuntimeError(f"Cold start of {name} failed:\n{completed.stderr}")
+            sample = json.loads(completed.stdout.strip().splitlines()[-1])
+            sample["process_seconds"] = process_seconds
+            samples.append(sample)
+        results[name] = {
+            key: float(np.median([sample[key] for sample in samples]))
+            for key in ("seconds", "process_seconds", "peak_rss_mb")
+        }
+        print(f"  cold start {name:<14} {results[name]['seconds'] * 1000:8.0f} ms "
+              f"(process {results[name]['process_seconds'] * 1000:.0f} ms), "
+              f"peak RSS {results[name]['peak_rss_mb']:.0f} MB")
+    return results
+
+
+def single_row_paths():
+    import app
+    from utils.predictor import get_predictor
+
+    # Importing the Streamlit apps outside `streamlit run` logs bare-mode warnings
+    logging.disable(logging.WARNING)
+    try:
+        import app_enhanced
+        import st_app
+    finally:
+        logging.disable(logging.NOTSET)
+
+    predictor = get_predictor()
+    raw = load_raw_pipeline()
+    client = app.app.test_client()
+
+    def flask_predict(row):
+        response = client.post("/predict", data=dict(zip(FORM_FIELDS, row.tolist())),
+                               headers={"Accept": "application/json"})
+        response.get_json()
+
+    return {
+        "raw_model": lambda row: raw(row.reshape(1, -1)),
+        "predictor": lambda row: predictor.predict(row),
+        "st_app.predict_crop": lambda row: st_app.predict_crop(row.tolist(), predictor),
+        "app_enhanced.predict_crop": lambda row: app_enhanced.predict_crop(row.tolist(), predictor),
+        "app_enhanced.recommend_crops": lambda row: app_enhanced.recommend_crops(row.tolist(), predictor),
+        "flask./predict": flask_predict,
+    }
+
+
+def bench_latency(features, rows):
+    results = {}
+    for name, fn in single_row_paths().items():
+        for row in features[:WARMUP_CALLS]:
+            fn(row)
+        results[name] = summarize(time_each(fn, features[:rows]))
+        print(f"  latency {name:<30} p50 {results[name]['p50_ms']:7.3f} ms  "
+              f"p95 {results[name]['p95_ms']:7.3f} ms  p99 {results[name]['p99_ms']:7.3f} ms")
+    return results
+
+
+def batch_paths():
+    import app
+    from utils.predictor import get_predictor
+
+    predictor = get_predictor()
+    raw = load_raw_pipeline()
+    client = app.app.test_client()
+
+    def flask_predict_batch(X):
+        response = client.post("/predict_batch", json=X.tolist())
+        response.get_data()
+
+    return {
+        "raw_model": raw,
+        "predictor": predictor.predict_with_proba,
+        "flask./predict_batch": flask_predict_batch,
+    }
+
+
+def bench_batches(features, batch_sizes, min_seconds):
+    rng = np.random.default_rng(SEED)
+    results = {}
+    for name, fn in batch_paths().items():
+        results[name] = {}
+        for size in batch_sizes:
+            X = features[rng.integers(0, len(features), size)]
+            fn(X)
+            timings = []
+            while sum(timings) < min_seconds or len(timings) < 3:
+                start = time.perf_counter()
+                fn(X)
+                timings.append(time.perf_counter() - start)
+            batch_ms = float(np.median(timings) * 1000)
+            results[name][str(size)] = {
+                "batches": len(timings),
+                "batch_p50_ms": batch_ms,
+                "rows_per_s": size / (batch_ms / 1000),
+            }
+        print(f"  batch {name:<22} " + "  ".join(
+            f"{size}: {results[name][str(size)]['rows_per_s']:,.0f} rows/s" for size in batch_sizes))
+    return results
+
+
+def forum_posts(count):
+    rng = np.random.default_rng(SEED)
+    topics = ("Irrigation", "Fertilizer", "Pests", "Market prices", "Weather")
+    words = ("rice", "water", "yield", "soil", "urea", "monsoon", "seed", "harvest", "price", "leaf")
+    return [
+        {
+            "id": i + 1,
+            "name": f"Farmer {i % 97}",
+            "topic": topics[i % len(topics)],
+            "message": " ".join(rng.choice(words, 30)),
+            "timestamp": "2024-06-01 10:00:00",
+            "replies": [],
+        }
+        for i in range(count)
+    ][::-1]
+
+
+def bench_forum(sizes):
+    from utils.forum import ForumStore, load_forum_data
+
+    results = {}
+    for size in sizes:
+        posts = forum_posts(size)
+        with tempfile.TemporaryDirectory() as tmp:
+            json_path = os.path.join(tmp, "forum_data.json")
+            db_path = os.path.join(tmp, "forum.db")
+            entry = {}
+
+            # Legacy storage: the whole file is rewritten on every post and read on every page view
+            def save_json(_):
+                with open(json_path, "w", encoding="utf-8") as f:
+                    json.dump(posts, f, ensure_ascii=False, indent=2)
+
+            entry["json_save"] = summarize(time_each(save_json, range(FORUM_FILE_ROUNDS)))
+            entry["json_load"] = summarize(time_each(lambda _: load_forum_data(json_path), range(FORUM_FILE_ROUNDS)))
+            entry["json_bytes"] = os.path.getsize(json_path)
+
+            store = ForumStore(db_path, legacy_path=os.path.join(tmp, "missing.json"), read_cache=False)
+            start = time.perf_counter()
+            store.migrate_json(json_path)
+            entry["db_import_ms"] = (time.perf_counter() - start) * 1000
+            entry["db_add_post"] = summarize(time_each(
+                lambda i: store.add_post("Bench", "Irrigation", f"bench post {i}"), range(FORUM_CALLS)))
+            entry["db_first_page"] = summarize(time_each(
+                lambda _: store.get_posts(FORUM_PAGE_SIZE), range(FORUM_CALLS)))
+            entry["db_last_page"] = summarize(time_each(
+                lambda _: store.get_posts(FORUM_PAGE_SIZE, max(0, size - FORUM_PAGE_SIZE)), range(FORUM_CALLS)))
+            entry["db_search"] = summarize(time_each(
+                lambda _: store.search("monsoon harvest", FORUM_PAGE_SIZE), range(FORUM_CALLS)))
+            entry["db_bytes"] = sum(os.path.getsize(os.path.join(tmp, name))
+                                    for name in os.listdir(tmp) if name.startswith("forum.db"))
+        results[str(size)] = entry
+        print(f"  forum {size:>6} posts: json save p50 {entry['json_save']['p50_ms']:.1f} ms, "
+              f"load p50 {entry['json_load']['p50_ms']:.1f} ms; "
+              f"db add p50 {entry['db_add_post']['p50_ms']:.2f} ms, first page p50 {entry['db_first_page']['p50_ms']:.2f} ms")
+    return results
+
+
+def flatten(tree, prefix=""):
+    flat = {}
+    for key, value in tree.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(current, baseline, threshold=REGRESSION_THRESHOLD):
+    """(metric, old, new, change) for metrics that got worse by more than threshold"""
+    old, new = flatten(baseline["results"]), flatten(current["results"])
+    regressions = []
+    for name in sorted(old.keys() & new.keys()):
+        # A single slowest call is mostly scheduling noise
+        if name.endswith("max_ms"):
+            continue
+        if name.endswith("_ms") and new[name] - old[name] < REGRESSION_MIN_DELTA_MS:
+            continue
+        if name.endswith(("_ms", "seconds", "_mb")):
+            change = (new[name] - old[name]) / old[name] if old[name] else 0.0
+        elif name.endswith("per_s"):
+            change = (old[name] - new[name]) / old[name] if old[name] else 0.0
+        else:
+            continue
+        if change > threshold:
+            regressions.append((name, old[name], new[name], change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--out", default="bench-results.json", help="where to write the JSON results")
+    parser.add_argument("--quick", action="store_true", help="fewer rows, sizes and rounds")
+    parser.add_argument("--only", nargs="+", choices=("cold_start", "latency", "batch", "forum"),
+                        help="run only these sections")
+    parser.add_argument("--compare", metavar="BASELINE", help="an earlier result file to compare against")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="relative change counted as a regression (default 0.10)")
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit with status 1 on regressions")
+    args = parser.parse_args()
+
+    warnings.simplefilter("ignore")
+    features, label_count = load_dataset()
+    settings = {
+        "latency_rows": len(features),
+        "batch_sizes": BATCH_SIZES,
+        "batch_min_seconds": BATCH_MIN_SECONDS,
+        "forum_sizes": FORUM_SIZES,
+        "cold_start_rounds": COLD_START_ROUNDS,
+    }
+    if args.quick:
+        settings.update(QUICK)
+    sections = args.only or ("cold_start", "latency", "batch", "forum")
+
+    report = {
+        "environment": environment(),
+        "dataset": {"file": DATASET_FILE, "rows": len(features), "labels": int(label_count), "seed": SEED},
+        "settings": {key: list(value) if isinstance(value, tuple) else value for key, value in settings.items()},
+        "results": {},
+    }
+    results = report["results"]
+    if "cold_start" in sections:
+        results["cold_start"] = bench_cold_start(features[0], settings["cold_start_rounds"])
+    if "latency" in sections:
+        results["latency"] = bench_latency(features, settings["latency_rows"])
+    if "batch" in sections:
+        results["batch"] = bench_batches(features, settings["batch_sizes"], settings["batch_min_seconds"])
+    if "forum" in sections:
+        results["forum"] = bench_forum(settings["forum_sizes"])
+    results["suite_peak_rss_mb"] = peak_rss_mb()
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=1)
+    print(f"\nWrote {args.out}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        print(f"Compared with {args.compare} (commit {baseline['environment'].get('commit')}):")
+        for name, old, new, change in regressions:
+            print(f"  REGRESSION {name}: {old:.4g} -> {new:.4g} ({change:+.0%} worse)")
+        if not regressions:
+            print(f"  no metric worse by more than {args.threshold:.0%}")
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,47 +1,49 @@
 import streamlit as st
-import numpy as np
-import pickle
 import os
-import requests
+import threading
+from utils.predictor import get_predictor
+from utils.insight_cache import INSIGHT_CACHE_BUCKETS, insight_cache, prompt_cache_key, quantize_features
+from utils.insight_catalog import insight_catalog
+from utils.inference import collect, stream_insight
+from utils.jobs import job_queue
+from utils.conversation import ConversationContext
 
 st.set_page_config(page_title="Crop Recommendation System", page_icon="🌱")
 
+# Seconds between checks of a background insight job
+INSIGHT_POLL_SECONDS = 2
+
 @st.cache_resource
-def load_models():
+def load_predictor():
     try:
-        model = pickle.load(open('model.pkl', 'rb'))
-        sc = pickle.load(open('standscaler.pkl', 'rb'))
-        ms = pickle.load(open('minmaxscaler.pkl', 'rb'))
-        return model, sc, ms
+        return get_predictor()
     except FileNotFoundError as e:
         st.error(f"Error loading model files: {str(e)}")
-        return None, None, None
-crop_dict = {
-    1: "Rice", 2: "Maize", 3: "Jute", 4: "Cotton", 5: "Coconut", 6: "Papaya", 7: "Orange",
-    8: "Apple", 9: "Muskmelon", 10: "Watermelon", 11: "Grapes", 12: "Mango", 13: "Banana",
-    14: "Pomegranate", 15: "Lentil", 16: "Blackgram", 17: "Mungbean", 18: "Mothbeans",
-    19: "Pigeonpeas", 20: "Kidneybeans", 21: "Chickpea", 22: "Coffee"
-}
-
-def predict_crop(features, model, sc, ms):
+        return None
+
+def predict_crop(features, predictor):
     """Make prediction using the pre-trained model"""
     try:
-        single_pred = np.array(features).reshape(1, -1)
-        scaled_features = ms.transform(single_pred)
-        final_features = sc.transform(scaled_features)
-        prediction = model.predict(final_features)
-        
-        if prediction[0] in crop_dict:
-            return crop_dict[prediction[0]]
-        return None
+        return predictor.predict_one(features)
     except Exception as e:
         st.error(f"Error making prediction: {str(e)}")
         return None
 
-def ai_recommendations(crop, features, chat_input=None, chat_history=None):
-    """Fetch cultivation insights from Mistral Nemo model"""
+def ai_recommendations(crop, features, chat_input=None, context=None, stream=False, cancel=None):
+    """Cultivation insights for crop: text when ready, else a stream (stream=True) or a queued Job"""
+    # Crop insights come from the prebuilt catalog; only chat questions go to the model
+    if not chat_input:
+        document = insight_catalog.get(crop)
+        if document:
+            return document
+
     api_url = "https://api-inference.huggingface.co/models/Qwen/Qwen2.5-7B-Instruct"
     api_token = os.getenv("HUGGINGFACE_API_TOKEN")
+    # Rounded readings let nearby ones share a cached answer; the prompt then says so
+    parameters_note = ""
+    if INSIGHT_CACHE_BUCKETS:
+        features = quantize_features(features)
+        parameters_note = " (rounded, treat them as approximate)"
 
     base_prompt = f"""Provide detailed agricultural guidance for {crop} cultivation, 
     focusing on:
@@ -51,15 +53,9 @@ def ai_recommendations(crop, features, chat_input=None, chat_history=None):
     4. Best cultivation seasons
     5. Key growth requirements"""
 
-    if chat_history:
-        history_context = "\n\nPrevious Conversation Context:\n" + "\n".join([f"{msg['role']}: {msg['content']}" for msg in chat_history])
-        prompt = f"{base_prompt}\n{history_context}"
-    else:
-        prompt = base_prompt
-
     detailed_prompt = f"""{base_prompt}
 
-    Detailed Soil and Environmental Parameters:
+    Detailed Soil and Environmental Parameters{parameters_note}:
     - Nitrogen: {features[0]:.1f}
     - Phosphorus: {features[1]:.1f}
     - Potassium: {features[2]:.1f}
@@ -71,18 +67,41 @@ def ai_recommendations(crop, features, chat_input=None, chat_history=None):
     Provide comprehensive agricultural insights taking these specific parameters into account."""
 
     if chat_input:
+        if context is not None and len(context):
+            detailed_prompt += f"\n\n{context.render()}"
         detailed_prompt += f"\n\nLatest User Query: {chat_input}"
 
-    headers = {"Authorization": f"Bearer {api_token}"}
-    
-    try:
-        response = requests.post(api_url, headers=headers, json={"inputs": detailed_prompt})
-        if response.status_code == 200:
-            return response.json()[0]["generated_text"]
+    cache_key = prompt_cache_key(api_url, detailed_prompt)
+    cached = insight_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    if stream:
+        return stream_insight(api_url, api_token, detailed_prompt, insight_cache, cache_key, cancel)
+
+    return job_queue.submit("insight", cache_key, {"api_url": api_url, "prompt": detailed_prompt, "cache_key": cache_key})
+
+@st.fragment(run_every=INSIGHT_POLL_SECONDS)
+def poll_insight_job(job_key, title):
+    """Placeholder that checks the job every few seconds; once it finishes, a full
+    rerun draws the result without this fragment, which stops the polling"""
+    job = job_queue.get(job_key)
+    if job is None or not job.pending:
+        st.rerun()
+    with st.expander(title, expanded=True):
+        st.info("Please wait, generating Agricultural insights...")
+
+def show_insight_job(job_key, title):
+    """Insight panel for a background job: polls while it is pending, then shows the result"""
+    job = job_queue.get(job_key)
+    if job is not None and job.pending:
+        poll_insight_job(job_key, title)
+        return
+    with st.expander(title, expanded=True):
+        if job is not None and job.status == 'done':
+            st.write(job.result)
         else:
-            return "Unable to fetch agricultural insights."
-    except Exception as e:
-        return f"Error fetching insights: {str(e)}"
+            st.warning(job.error if job is not None else "Unable to fetch agricultural insights.")
 
 def main():
     st.title("Crop Recommendation System 🌱")
@@ -95,8 +114,8 @@ def main():
     if 'current_features' not in st.session_state:
         st.session_state.current_features = None
 
-    model, sc, ms = load_models()
-    if model is not None:
+    predictor = load_predictor()
+    if predictor is not None:
         col1, col2 = st.columns(2)
         
         with col1:
@@ -112,18 +131,47 @@ def main():
 
         if st.button("Get Recommendation"):
             feature_list = [nitrogen, phosphorus, potassium, temperature, humidity, ph, rainfall]
-            result = predict_crop(feature_list, model, sc, ms)
+            result = predict_crop(feature_list, predictor)
             if result:
                 st.session_state.chat_history = []
+                st.session_state.pop('chat_stream', None)
+                st.session_state.chat_context = ConversationContext()
                 st.session_state.current_crop = result
                 st.session_state.current_features = feature_list
-                st.success(f"Based on the parameters, {result} is the best crop to cultivate! 🌱")
-                with st.spinner("Please wait,generating Agricultural insights..."):
-                    description = ai_recommendations(result, feature_list)
+                # Insights the model still has to write come from a background job, so the result shows at once
+                description = ai_recommendations(result, feature_list)
+                # Kept in session state so the result survives reruns, including the one that ends polling
+                st.session_state.recommendation = {
+                    'crop': result,
+                    'insight': description if isinstance(description, str) else None,
+                    'insight_job': None if isinstance(description, str) else description.key,
+                }
+        recommendation = st.session_state.get('recommendation')
+        if recommendation:
+            result = recommendation['crop']
+            st.success(f"Based on the parameters, {result} is the best crop to cultivate! 🌱")
+            if recommendation['insight_job'] is None:
                 with st.expander(f"Agricultural Insights for {result}"):
-                    st.write(description)
+                    st.write(recommendation['insight'])
+            else:
+                show_insight_job(recommendation['insight_job'], f"Agricultural Insights for {result}")
         if st.session_state.current_crop:
             st.subheader(f"Chat about {st.session_state.current_crop} Cultivation")
+            context = st.session_state.get('chat_context')
+            if context is None:
+                context = st.session_state.chat_context = ConversationContext.from_history(st.session_state.chat_history)
+            
+            interrupted = st.session_state.pop('chat_stream', None)
+            if interrupted is not None:
+                # A new message arrived while the last answer was still streaming
+                interrupted['cancel'].set()
+                if interrupted['parts']:
+                    partial = "".join(interrupted['parts']) + " …"
+                    st.session_state.chat_history.append({
+                        'role': 'AI',
+                        'content': partial
+                    })
+                    context.add('AI', partial)
             for msg in st.session_state.chat_history:
                 st.chat_message(msg['role']).write(msg['content'])
             chat_input = st.chat_input("Ask a specific question about crop cultivation")
@@ -133,18 +181,28 @@ def main():
                     'content': chat_input
                 })
                 st.chat_message('user').write(chat_input)
-                with st.spinner("Generating response..."):
-                    chat_response = ai_recommendations(
-                        st.session_state.current_crop, 
-                        st.session_state.current_features, 
-                        chat_input, 
-                        st.session_state.chat_history
-                    )
-                    st.session_state.chat_history.append({
-                        'role': 'AI',
-                        'content': chat_response
-                    })
-                    st.chat_message('AI').write(chat_response)
+                chat_stream = {'cancel': threading.Event(), 'parts': []}
+                st.session_state.chat_stream = chat_stream
+                chat_response = ai_recommendations(
+                    st.session_state.current_crop, 
+                    st.session_state.current_features, 
+                    chat_input, 
+                    context,
+                    stream=True,
+                    cancel=chat_stream['cancel']
+                )
+                context.add('user', chat_input)
+                with st.chat_message('AI'):
+                    if isinstance(chat_response, str):
+                        st.write(chat_response)
+                    else:
+                        chat_response = st.write_stream(collect(chat_response, chat_stream['parts']))
+                st.session_state.pop('chat_stream', None)
+                st.session_state.chat_history.append({
+                    'role': 'AI',
+                    'content': chat_response
+                })
+                context.add('AI', chat_response)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
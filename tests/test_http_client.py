@@ -0,0 +1,222 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from utils.http_client import CircuitOpenError, HttpClient
+from utils.metrics import UPSTREAM_IN_FLIGHT, UPSTREAM_SECONDS, registry
+
+READ_TIMEOUT = 0.3
+SLOW_SECONDS = 0.6
+FAILURE_THRESHOLD = 3
+RESET_TIMEOUT = 0.3
+STREAM_PAUSE = 0.3
+HOST = "127.0.0.1"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Routes of the stub upstream; class attributes are the server state, reset per test"""
+
+    protocol_version = "HTTP/1.1"
+    connections = 0
+    hits = {}
+    flaky_left = 0
+    down = False
+    lock = threading.Lock()
+
+    @classmethod
+    def reset(cls):
+        with cls.lock:
+            cls.connections = 0
+            cls.hits = {}
+            cls.flaky_left = 0
+            cls.down = False
+
+    @classmethod
+    def count(cls, path):
+        with cls.lock:
+            return cls.hits.pop(path, 0)
+
+    def log_message(self, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        with StubHandler.lock:
+            StubHandler.connections += 1
+
+    def reply(self, status, body=b"ok"):
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def handle_route(self):
+        if self.headers.get("Content-Length"):
+            self.rfile.read(int(self.headers["Content-Length"]))
+        path = self.path
+        with StubHandler.lock:
+            StubHandler.hits[path] = StubHandler.hits.get(path, 0) + 1
+        if path == "/ok":
+            self.reply(200)
+        elif path == "/flaky":
+            with StubHandler.lock:
+                failing = StubHandler.flaky_left > 0
+                StubHandler.flaky_left -= failing
+            self.reply(503 if failing else 200)
+        elif path == "/slow":
+            time.sleep(SLOW_SECONDS)
+            try:
+                self.reply(200)
+            except (BrokenPipeError, ConnectionResetError):
+                # The client has timed out and hung up
+                self.close_connection = True
+        elif path == "/down":
+            self.reply(503 if StubHandler.down else 200)
+        elif path == "/broken":
+            # A chunk header that is not hex: requests raises ChunkedEncodingError
+            self.send_response(200)
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            self.wfile.write(b"zz\r\nbroken\r\n")
+            self.close_connection = True
+        elif path == "/stream":
+            # Headers at once, the body in two chunks with a pause between them
+            self.send_response(200)
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            self.wfile.write(b"5\r\nfirst\r\n")
+            self.wfile.flush()
+            time.sleep(STREAM_PAUSE)
+            self.wfile.write(b"6\r\nsecond\r\n0\r\n\r\n")
+        else:
+            self.reply(404)
+
+    do_GET = handle_route
+    do_POST = handle_route
+
+
+@pytest.fixture(scope="module")
+def server():
+    server = ThreadingHTTPServer((HOST, 0), StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://{HOST}:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def base(server):
+    StubHandler.reset()
+    return server
+
+
+@pytest.fixture
+def http():
+    client = HttpClient(timeouts={HOST: (1, READ_TIMEOUT)}, backoff_base=0.01, backoff_max=0.02,
+                        failure_threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT)
+    yield client
+    client.session.close()
+
+
+def open_then_wait(http, base):
+    StubHandler.down = True
+    http.get(f"{base}/down")
+    StubHandler.down = False
+    assert http.breaker(HOST).state == "open"
+    time.sleep(RESET_TIMEOUT)
+
+
+def test_keep_alive_reuses_one_connection(http, base):
+    for _ in range(5):
+        assert http.get(f"{base}/ok").status_code == 200
+    assert StubHandler.connections == 1
+
+
+def test_retryable_status_is_retried(http, base):
+    StubHandler.flaky_left = 2
+    assert http.get(f"{base}/flaky").status_code == 200
+    assert StubHandler.count("/flaky") == 3
+    assert http.breaker(HOST).failures == 0
+
+
+@pytest.mark.parametrize("method, attempts", [("GET", 3), ("POST", 1)])
+def test_read_timeout_is_retried_only_for_idempotent_methods(http, base, method, attempts):
+    with pytest.raises(requests.ReadTimeout):
+        http.request(method, f"{base}/slow")
+    assert StubHandler.count("/slow") == attempts
+
+
+def test_breaker_opens_and_closes(http, base):
+    breaker = http.breaker(HOST)
+    StubHandler.down = True
+    assert http.get(f"{base}/down").status_code == 503
+    assert StubHandler.count("/down") == FAILURE_THRESHOLD
+    assert breaker.state == "open"
+
+    with pytest.raises(CircuitOpenError):
+        http.get(f"{base}/down")
+    assert StubHandler.count("/down") == 0
+
+    StubHandler.down = False
+    time.sleep(RESET_TIMEOUT)
+    assert breaker.state == "half-open"
+    assert http.get(f"{base}/down").status_code == 200
+    assert breaker.state == "closed"
+
+
+def test_broken_trial_does_not_wedge_the_breaker(http, base):
+    breaker = http.breaker(HOST)
+    open_then_wait(http, base)
+    with pytest.raises(requests.exceptions.ChunkedEncodingError):
+        http.get(f"{base}/broken")
+    assert breaker.state == "open"
+
+    time.sleep(RESET_TIMEOUT)
+    assert http.get(f"{base}/ok").status_code == 200
+    assert breaker.state == "closed"
+
+
+def test_non_requests_error_does_not_wedge_the_breaker(http, base, monkeypatch):
+    breaker = http.breaker(HOST)
+    open_then_wait(http, base)
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("stub failure")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(http.session, "request", fail)
+        with pytest.raises(RuntimeError):
+            http.get(f"{base}/ok")
+    assert breaker.state == "open"
+
+    time.sleep(RESET_TIMEOUT)
+    assert http.get(f"{base}/ok").status_code == 200
+    assert breaker.state == "closed"
+
+
+def in_flight():
+    return UPSTREAM_IN_FLIGHT._values.get((HOST,), 0)
+
+
+def upstream_seconds():
+    entry = UPSTREAM_SECONDS._values.get((HOST,))
+    return entry[1] if entry else 0.0
+
+
+@pytest.mark.skipif(not registry.enabled, reason="metrics are disabled")
+def test_streamed_request_is_in_flight_until_closed(http, base):
+    before, seconds = in_flight(), upstream_seconds()
+    response = http.get(f"{base}/stream", stream=True)
+    assert in_flight() == before + 1
+    assert b"".join(response.iter_content(chunk_size=None)) == b"firstsecond"
+    assert in_flight() == before + 1
+
+    response.close()
+    assert in_flight() == before
+    assert upstream_seconds() - seconds >= STREAM_PAUSE
+    response.close()
+    assert in_flight() == before
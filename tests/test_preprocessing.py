@@ -0,0 +1,45 @@
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.predictor import FEATURE_NAMES
+from utils.preprocessing import MINMAX_SCALER_FILE, STANDARD_SCALER_FILE, load_scaler
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MINMAX_PATH = os.path.join(ROOT, MINMAX_SCALER_FILE)
+STANDARD_PATH = os.path.join(ROOT, STANDARD_SCALER_FILE)
+
+
+@pytest.fixture(scope="module")
+def readings():
+    frame = pd.read_csv(os.path.join(ROOT, "Crop_recommendation.csv"))
+    return frame[list(FEATURE_NAMES)].to_numpy(dtype=float)
+
+
+@pytest.fixture(scope="module")
+def scalers():
+    with open(MINMAX_PATH, "rb") as f:
+        ms = pickle.load(f)
+    with open(STANDARD_PATH, "rb") as f:
+        sc = pickle.load(f)
+    return ms, sc
+
+
+def test_fused_matches_two_step(readings, scalers):
+    ms, sc = scalers
+    expected = sc.transform(ms.transform(readings))
+    fused = load_scaler(MINMAX_PATH, STANDARD_PATH).transform(readings)
+    np.testing.assert_allclose(fused, expected, rtol=1e-12, atol=1e-12)
+
+
+def test_single_row_matches_batch(readings):
+    scaler = load_scaler(MINMAX_PATH, STANDARD_PATH)
+    np.testing.assert_array_equal(scaler.transform(readings[0]), scaler.transform(readings[:1]))
+
+
+def test_wrong_feature_count(readings):
+    with pytest.raises(ValueError):
+        load_scaler(MINMAX_PATH, STANDARD_PATH).transform(readings[:, :6])
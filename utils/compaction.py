@@ -0,0 +1,271 @@
+"""Shrink the served forest while holding its held-out accuracy.
+
+A compacted forest keeps the first n trees (the trees of a random forest are
+interchangeable), cuts them at a maximum depth (a cut node becomes a leaf that
+votes for its majority class, like the pure leaves of a fully grown tree) and
+merges splits whose two sides end in identical leaves. The node arrays are
+then stored in the smallest types that hold them: float32 thresholds, uint8
+feature ids, uint16 node indices for forests under 65,536 nodes, and uint8
+leaf values when every leaf is pure.
+Cutting and merging alone drops unreachable nodes; the type changes do not
+alter a single prediction.
+
+    python -m utils.compaction                    # trade-off table only
+    python -m utils.compaction --install          # serve the chosen forest
+
+Every combination of --trees and --depths is measured for size, latency,
+held-out accuracy and agreement with the original forest on the dataset
+rows. The smallest one within --tolerance of the original accuracy is chosen.
+"""
+import json
+import time
+
+import numpy as np
+
+from utils.forest import FlatForest, _round_down_float32
+from utils.model_store import (ARTIFACT_DIR, MODEL_FILE, MODEL_INFO_FILE, export_artifact, load_pickles,
+                               read_model_labels, source_fingerprint, source_paths)
+from utils.preprocessing import MINMAX_SCALER_FILE, STANDARD_SCALER_FILE
+from utils.training import DATASET_FILE, file_sha256, load_training_data, split_dataset
+
+TREE_COUNTS = (10, 20, 30, 50, 75, 100)
+MAX_DEPTHS = (None, 14, 12, 10, 8, 6)
+# Allowed drop in held-out accuracy, as a fraction (0.005 is half a point)
+ACCURACY_TOLERANCE = 0.005
+LATENCY_ROWS = 300
+BATCH_ROWS = 10000
+
+
+def forest_bytes(forest):
+    return sum(array.nbytes for array in (forest.feature, forest.threshold, forest.children,
+                                          forest.value, forest.roots, forest.classes_))
+
+
+def cut_forest(forest, n_estimators=None, max_depth=None, prune=True):
+    """FlatForest of the first n_estimators trees, cut at max_depth, with redundant splits merged"""
+    children = np.asarray(forest.children).reshape(-1, 2)
+    is_leaf = children[:, 0] == np.arange(forest.node_count)
+    value = np.asarray(forest.value)
+    # Split nodes that get cut vote for their majority class; leaves keep their values
+    votes = value.copy()
+    split = np.flatnonzero(~is_leaf)
+    votes[split] = 0.0
+    votes[split, np.argmax(value[split], axis=1)] = 1.0
+
+    def shape(node, depth):
+        # An int is a leaf (the node whose value it keeps), a tuple a split
+        if is_leaf[node] or (max_depth is not None and depth >= max_depth):
+            return node
+        left = shape(int(children[node, 0]), depth + 1)
+        right = shape(int(children[node, 1]), depth + 1)
+        if prune and isinstance(left, int) and isinstance(right, int) and np.array_equal(votes[left], votes[right]):
+            return left
+        return (node, left, right)
+
+    features, thresholds, values, links = [], [], [], []
+    deepest = 0
+
+    def emit(tree, depth):
+        # Pre-order, so a left child directly follows its parent as in sklearn
+        nonlocal deepest
+        deepest = max(deepest, depth)
+        index = len(features)
+        node = tree if isinstance(tree, int) else tree[0]
+        features.append(0 if isinstance(tree, int) else int(forest.feature[node]))
+        thresholds.append(0.0 if isinstance(tree, int) else float(forest.threshold[node]))
+        values.append(node)
+        links.append((index, index))
+        if not isinstance(tree, int):
+            links[index] = (emit(tree[1], depth + 1), emit(tree[2], depth + 1))
+        return index
+
+    roots = []
+    for root in forest.roots[:n_estimators]:
+        roots.append(len(features))
+        emit(shape(int(root), 0), 0)
+
+    return FlatForest(
+        np.asarray(features, dtype=np.int32),
+        np.asarray(thresholds, dtype=np.float64),
+        np.asarray(links, dtype=np.int32).ravel(),
+        votes[values],
+        np.asarray(roots, dtype=np.int32),
+        forest.classes_,
+        deepest,
+    )
+
+
+def pack_forest(forest):
+    """Same forest in the smallest array types that give identical predictions"""
+    node_type = np.uint16 if forest.node_count <= np.iinfo(np.uint16).max else np.uint32
+    feature_type = np.uint8 if int(forest.feature.max(initial=0)) <= np.iinfo(np.uint8).max else np.uint16
+    children = np.asarray(forest.children).reshape(-1, 2)
+    leaf_value = forest.value[children[:, 0] == np.arange(forest.node_count)]
+    pure = bool(np.all((leaf_value == 0.0) | (leaf_value == 1.0)))
+    return FlatForest(
+        forest.feature.astype(feature_type),
+        # Rounded down as FlatForest does at load time, so float32 inputs split the same way
+        _round_down_float32(np.asarray(forest.threshold)),
+        forest.children.astype(node_type),
+        forest.value.astype(np.uint8 if pure else np.float32),
+        forest.roots.astype(node_type),
+        forest.classes_,
+        forest.max_depth,
+    )
+
+
+def compact_forest(forest, n_estimators=None, max_depth=None):
+    return pack_forest(cut_forest(forest, n_estimators, max_depth))
+
+
+def recorded_split(dataset, info_path=MODEL_INFO_FILE):
+    """The model info when it records a train/test split of dataset as it is now, else None"""
+    try:
+        with open(info_path, "r", encoding="utf-8") as f:
+            info = json.load(f)
+    except FileNotFoundError:
+        print(f"No {info_path}: the model predates utils.training, so its training rows are "
+              "unknown and the held-out accuracy may be optimistic")
+        return None
+    if info["dataset"]["sha256"] != file_sha256(dataset):
+        print(f"{dataset} changed since the model was trained; held-out rows are a fresh split")
+        return None
+    return info
+
+
+def held_out_split(X, y, dataset, info_path=MODEL_INFO_FILE):
+    """Test rows of the split the served model was trained with, when utils.training recorded it"""
+    info = recorded_split(dataset, info_path)
+    if info is None:
+        return split_dataset(X, y)[1::2]
+    return split_dataset(X, y, info["dataset"]["test_rows"], info["training"]["random_state"])[1::2]
+
+
+def measure(forest, X_test, y_test, X_all, reference, rng):
+    """Size, latency, held-out accuracy and agreement with the reference predictions"""
+    single = []
+    for i in rng.integers(0, len(X_all), LATENCY_ROWS):
+        row = X_all[i:i + 1]
+        start = time.perf_counter()
+        forest.predict_proba(row)
+        single.append(time.perf_counter() - start)
+    batch = np.resize(X_all, (BATCH_ROWS, X_all.shape[1]))
+    batch_times = []
+    for _ in range(3):
+        start = time.perf_counter()
+        forest.predict_proba(batch)
+        batch_times.append(time.perf_counter() - start)
+    return {
+        "trees": forest.n_estimators,
+        "max_depth": forest.max_depth,
+        "nodes": forest.node_count,
+        "bytes": forest_bytes(forest),
+        "accuracy": float(np.mean(forest.predict(X_test) == y_test)),
+        "agreement": float(np.mean(forest.predict(X_all) == reference)),
+        "p50_us": float(np.median(single) * 1e6),
+        "batch_rows_per_s": float(len(batch) / np.median(batch_times)),
+    }
+
+
+def trade_off(forest, scaler, dataset=DATASET_FILE, tree_counts=TREE_COUNTS, max_depths=MAX_DEPTHS,
+              info_path=MODEL_INFO_FILE, seed=0):
+    """Measurements for the original forest and every (trees, depth) compaction of it"""
+    X, y, _ = load_training_data(dataset)
+    X_test, y_test = held_out_split(X, y, dataset, info_path)
+    rng = np.random.default_rng(seed)
+    X_all = scaler.transform(X)
+    X_test = scaler.transform(X_test)
+    reference = forest.predict(X_all)
+
+    original = measure(forest, X_test, y_test, X_all, reference, rng)
+    points = []
+    for trees in sorted({min(n, forest.n_estimators) for n in tree_counts}):
+        for depth in max_depths:
+            if depth is not None and depth >= forest.max_depth:
+                depth = None
+            if any(p["params"] == {"trees": trees, "depth": depth} for p in points):
+                continue
+            point = measure(compact_forest(forest, trees, depth), X_test, y_test, X_all, reference, rng)
+            point["params"] = {"trees": trees, "depth": depth}
+            points.append(point)
+    return original, points
+
+
+def choose(original, points, tolerance=ACCURACY_TOLERANCE):
+    """Smallest point whose held-out accuracy is within tolerance of the original"""
+    eligible = [p for p in points if p["accuracy"] >= original["accuracy"] - tolerance]
+    return min(eligible, key=lambda p: (p["bytes"], p["p50_us"]), default=None)
+
+
+def pareto(points):
+    """Points no other point beats on both size and accuracy"""
+    return [p for p in points
+            if not any(q["bytes"] <= p["bytes"] and q["accuracy"] >= p["accuracy"]
+                       and (q["bytes"], q["accuracy"]) != (p["bytes"], p["accuracy"]) for q in points)]
+
+
+def print_table(original, points, chosen):
+    front = {id(p) for p in pareto(points)}
+    print(f"  {'trees':>5} {'depth':>5} {'nodes':>7} {'KB':>8} {'accuracy':>9} {'agree':>7} "
+          f"{'p50 us':>8} {'rows/s':>10}")
+    rows = [(" ", original)] + [(">" if p is chosen else "*" if id(p) in front else " ", p)
+                                for p in sorted(points, key=lambda p: p["bytes"], reverse=True)]
+    for mark, p in rows:
+        depth = p["params"]["depth"] if "params" in p else "orig"
+        print(f"{mark} {p['trees']:>5} {str(depth or '-'):>5} {p['nodes']:>7} {p['bytes'] / 1024:>8.1f} "
+              f"{p['accuracy']:>9.4f} {p['agreement']:>7.4f} {p['p50_us']:>8.1f} {p['batch_rows_per_s']:>10.0f}")
+    print("* size/accuracy trade-off front   > chosen")
+
+
+if __name__ == "__main__":
+    import argparse
+    import warnings
+
+    parser = argparse.ArgumentParser(description="Compact the served forest within an accuracy tolerance")
+    parser.add_argument("--model", default=MODEL_FILE)
+    parser.add_argument("--minmax", default=MINMAX_SCALER_FILE)
+    parser.add_argument("--standard", default=STANDARD_SCALER_FILE)
+    parser.add_argument("--info", default=MODEL_INFO_FILE)
+    parser.add_argument("--data", default=DATASET_FILE)
+    parser.add_argument("--tolerance", type=float, default=ACCURACY_TOLERANCE,
+                        help="allowed drop in held-out accuracy (0.005 = half a point)")
+    parser.add_argument("--trees", type=int, nargs="+", default=TREE_COUNTS)
+    parser.add_argument("--depths", type=int, nargs="+", default=[d for d in MAX_DEPTHS if d],
+                        help="depth limits to try, besides no limit")
+    parser.add_argument("--report", help="write every measured point to this JSON file")
+    parser.add_argument("--out", help="write the chosen forest as a model artifact here")
+    parser.add_argument("--install", action="store_true", help=f"write the chosen forest to {ARTIFACT_DIR}")
+    parser.add_argument("--force", action="store_true",
+                        help="write the chosen forest even without a recorded held-out split")
+    args = parser.parse_args()
+
+    # Without the training split the accuracy is measured on rows the model saw,
+    # so the tolerance check cannot be trusted to pick a forest to serve
+    if (args.install or args.out) and not args.force and recorded_split(args.data, args.info) is None:
+        parser.error("refusing to write a compacted forest without a recorded held-out split; "
+                     "retrain with utils.training or pass --force")
+
+    warnings.simplefilter("ignore")
+    forest, scaler = load_pickles(args.model, args.minmax, args.standard)
+    original, points = trade_off(forest, scaler, args.data, args.trees, (None, *args.depths), args.info)
+    chosen = choose(original, points, args.tolerance)
+    print_table(original, points, chosen)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump({"tolerance": args.tolerance, "original": original, "points": points,
+                       "chosen": chosen and chosen["params"]}, f, indent=2)
+    if chosen is None:
+        raise SystemExit(f"No compaction stays within {args.tolerance} of the original accuracy")
+
+    print(f"\nChosen: {chosen['trees']} trees, depth {chosen['max_depth']}, "
+          f"{original['bytes'] / chosen['bytes']:.1f}x smaller, accuracy {chosen['accuracy']:.4f} "
+          f"(original {original['accuracy']:.4f}), agreement {chosen['agreement']:.4f}")
+    out = ARTIFACT_DIR if args.install else args.out
+    if out:
+        # The artifact keeps the fingerprint of the pickles, so it is served until they change
+        sources = source_fingerprint(source_paths(args.model, args.minmax, args.standard, args.info))
+        compaction = {**chosen["params"], "tolerance": args.tolerance, "accuracy": chosen["accuracy"],
+                      "original_accuracy": original["accuracy"], "agreement": chosen["agreement"]}
+        export_artifact(compact_forest(forest, chosen["params"]["trees"], chosen["params"]["depth"]),
+                        scaler, out, sources, read_model_labels(args.info), compaction)
+        print(f"Wrote {out}")
@@ -0,0 +1,111 @@
+"""Chat context that stays the same size however long the conversation runs.
+
+Recent turns are kept word for word inside a token budget. Turns pushed out
+of that window are condensed to one line each into a running summary, which
+has its own budget and drops its oldest lines first. Each turn is handled
+once when added, so building a prompt costs the same on turn 5 and turn 500.
+"""
+import re
+from collections import deque
+
+WINDOW_TOKEN_BUDGET = 600
+SUMMARY_TOKEN_BUDGET = 200
+# Longer single messages are clipped before they enter the window
+MAX_TURN_TOKENS = 300
+SUMMARY_LINE_CHARS = 120
+
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?।])\s")
+
+
+def estimate_tokens(text):
+    """Rough token count without a tokenizer.
+
+    About four UTF-8 bytes per token fits English subword tokenizers, and it
+    also counts Telugu (three bytes per character) closer to its real cost
+    than a character count would.
+    """
+    return len(text.encode("utf-8")) // 4 + 1
+
+
+def clip_to_tokens(text, tokens):
+    limit = tokens * 4
+    if len(text.encode("utf-8")) <= limit:
+        return text
+    clipped = text.encode("utf-8")[:limit].decode("utf-8", errors="ignore")
+    return clipped.rsplit(" ", 1)[0] + " …"
+
+
+def condense(text, max_chars=SUMMARY_LINE_CHARS):
+    """First sentence of text, cut to max_chars"""
+    text = " ".join(text.split())
+    first = _SENTENCE_END_RE.split(text, 1)[0]
+    if len(first) <= max_chars:
+        return first
+    return first[:max_chars].rsplit(" ", 1)[0] + " …"
+
+
+def speaker(role):
+    return "Farmer" if role == "user" else "Assistant"
+
+
+class ConversationContext:
+    def __init__(self, window_tokens=WINDOW_TOKEN_BUDGET, summary_tokens=SUMMARY_TOKEN_BUDGET,
+                 max_turn_tokens=MAX_TURN_TOKENS):
+        self.window_tokens = window_tokens
+        self.summary_tokens = summary_tokens
+        self.max_turn_tokens = max_turn_tokens
+        self.turns = deque()
+        self.summary = deque()
+        self.omitted_turns = 0
+        self._turn_tokens = 0
+        self._summary_token_count = 0
+        self._rendered = None
+
+    @classmethod
+    def from_history(cls, history, **budgets):
+        context = cls(**budgets)
+        for message in history:
+            context.add(message["role"], message["content"])
+        return context
+
+    def add(self, role, content):
+        line = f"{speaker(role)}: {clip_to_tokens(str(content).strip(), self.max_turn_tokens)}"
+        tokens = estimate_tokens(line)
+        self.turns.append((role, line, tokens))
+        self._turn_tokens += tokens
+        while self._turn_tokens > self.window_tokens and len(self.turns) > 1:
+            old_role, old_line, old_tokens = self.turns.popleft()
+            self._turn_tokens -= old_tokens
+            self._summarize(old_role, old_line)
+        self._rendered = None
+
+    def _summarize(self, role, line):
+        summary_line = f"- {speaker(role)}: {condense(line.split(': ', 1)[1])}"
+        tokens = estimate_tokens(summary_line)
+        self.summary.append((summary_line, tokens))
+        self._summary_token_count += tokens
+        while self._summary_token_count > self.summary_tokens and self.summary:
+            _, dropped = self.summary.popleft()
+            self._summary_token_count -= dropped
+            self.omitted_turns += 1
+
+    def render(self):
+        """Context block for the prompt, empty before the first turn"""
+        if self._rendered is None:
+            sections = []
+            if self.summary or self.omitted_turns:
+                lines = ["Summary of earlier conversation:"]
+                if self.omitted_turns:
+                    lines.append(f"- ({self.omitted_turns} earlier messages omitted)")
+                lines.extend(line for line, _ in self.summary)
+                sections.append("\n".join(lines))
+            if self.turns:
+                sections.append("Recent conversation:\n" + "\n".join(line for _, line, _ in self.turns))
+            self._rendered = "\n\n".join(sections)
+        return self._rendered
+
+    def tokens(self):
+        return self._turn_tokens + self._summary_token_count
+
+    def __len__(self):
+        return len(self.turns) + len(self.summary) + self.omitted_turns
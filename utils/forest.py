@@ -0,0 +1,172 @@
+import numpy as np
+
+# Rows are scored in blocks so the working arrays (rows x trees) stay cache sized
+BLOCK_ROWS = 1024
+# Levels after which rows that already sit on a leaf are dropped from the traversal
+COMPACT_AT_DEPTH = (6, 8, 10, 12)
+
+
+class FlatForest:
+    """RandomForestClassifier flattened into contiguous node arrays.
+
+    All trees are stored back to back in the same arrays and walked together,
+    one level per step, with numpy gathers instead of per-row Python calls.
+    Leaves point at themselves, so max_depth steps land every row on a leaf.
+    Predictions are bit-identical to sklearn's predict_proba.
+    """
+
+    def __init__(self, feature, threshold, children, value, roots, classes, max_depth):
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.value = value
+        self.roots = roots
+        self.classes_ = np.asarray(classes)
+        self.max_depth = int(max_depth)
+        self.n_estimators = len(roots)
+        self.n_classes_ = value.shape[1]
+        self._compile()
+
+    @classmethod
+    def from_sklearn(cls, forest):
+        features, thresholds, children, values, roots = [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            index = np.arange(tree.node_count) + offset
+            is_leaf = tree.children_left == -1
+
+            left = np.where(is_leaf, index, tree.children_left + offset)
+            right = np.where(is_leaf, index, tree.children_right + offset)
+            value = tree.value[:, 0, :].astype(np.float64)
+            # Same normalization sklearn applies in DecisionTreeClassifier.predict_proba
+            normalizer = value.sum(axis=1)[:, None]
+            normalizer[normalizer == 0.0] = 1.0
+
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(np.where(is_leaf, 0.0, tree.threshold))
+            # children[2 * node] goes left, children[2 * node + 1] goes right
+            children.append(np.column_stack([left, right]).ravel())
+            values.append(value / normalizer)
+            roots.append(offset)
+            offset += tree.node_count
+            max_depth = max(max_depth, tree.max_depth)
+
+        return cls(
+            np.concatenate(features).astype(np.int32),
+            np.concatenate(thresholds).astype(np.float64),
+            np.concatenate(children).astype(np.int32),
+            np.concatenate(values),
+            np.asarray(roots, dtype=np.int32),
+            forest.classes_,
+            max_depth,
+        )
+
+    def _compile(self):
+        # Working tables are indexed by 2 * node + direction, so stepping to a
+        # child is a single gather. Indices are intp because numpy converts any
+        # other index dtype on every take.
+        self._feature = np.repeat(self.feature, 2).astype(np.intp)
+        self._threshold = np.repeat(_round_down_float32(self.threshold), 2)
+        self._children = 2 * self.children.astype(np.intp)
+        self._roots = 2 * self.roots.astype(np.intp)
+        is_leaf = self.children[0::2] == np.arange(self.node_count)
+        self._is_leaf = np.repeat(is_leaf, 2)
+
+        # When every leaf is pure each tree casts exactly one vote, so the
+        # probability sum can be done as an integer count without any rounding
+        leaf_value = self.value[is_leaf]
+        self._votes_only = bool(np.all((leaf_value == 0.0) | (leaf_value == 1.0)))
+        self._leaf_class = np.argmax(self.value, axis=1).astype(np.intp)
+
+    @property
+    def node_count(self):
+        return len(self.feature)
+
+    def _apply_block(self, X):
+        """Leaf reached by every row in every tree, tree-major, shape (n_trees, n_rows)"""
+        n_rows = len(X)
+        # Feature-major copy of X so a value is found at feature * n_rows + row
+        flat_X = np.ascontiguousarray(X.T).ravel()
+        node = np.repeat(self._roots, n_rows)
+        row = np.tile(np.arange(n_rows, dtype=np.intp), self.n_estimators)
+        compact = n_rows * self.n_estimators >= 4096
+        leaves = None
+        position = None
+
+        for depth in range(self.max_depth):
+            if depth in COMPACT_AT_DEPTH and not compact:
+                # Too few rows for compaction to pay off; only stop early once all are done
+                if np.take(self._is_leaf, node).all():
+                    break
+            elif depth in COMPACT_AT_DEPTH:
+                # Park finished rows in leaves and keep walking only the rest
+                active = np.flatnonzero(~np.take(self._is_leaf, node))
+                if leaves is None:
+                    leaves = node.copy()
+                    position = active
+                else:
+                    leaves[position] = node
+                    position = np.take(position, active)
+                node = np.take(node, active)
+                row = np.take(row, active)
+                if not len(node):
+                    break
+
+            index = np.take(self._feature, node)
+            index *= n_rows
+            index += row
+            node += np.take(flat_X, index) > np.take(self._threshold, node)
+            node = np.take(self._children, node)
+
+        if leaves is None:
+            leaves = node
+        else:
+            leaves[position] = node
+        return (leaves // 2).reshape(self.n_estimators, n_rows)
+
+    def apply(self, X):
+        """Leaf index reached in every tree, shape (n_rows, n_trees)"""
+        X = _as_float32_matrix(X)
+        return np.concatenate([
+            self._apply_block(X[start:start + BLOCK_ROWS]).T
+            for start in range(0, len(X), BLOCK_ROWS)
+        ]) if len(X) else np.empty((0, self.n_estimators), dtype=np.intp)
+
+    def predict_proba(self, X):
+        X = _as_float32_matrix(X)
+        proba = np.empty((len(X), self.n_classes_))
+        for start in range(0, len(X), BLOCK_ROWS):
+            leaves = self._apply_block(X[start:start + BLOCK_ROWS])
+            block = proba[start:start + BLOCK_ROWS]
+            if self._votes_only:
+                votes = np.take(self._leaf_class, leaves)
+                votes += np.arange(leaves.shape[1]) * self.n_classes_
+                block[:] = np.bincount(votes.ravel(), minlength=block.size).reshape(block.shape)
+            else:
+                # Add trees one after another, the order sklearn accumulates them in
+                block[:] = 0.0
+                for tree_leaves in leaves:
+                    block += np.take(self.value, tree_leaves, axis=0)
+        proba /= self.n_estimators
+        return proba
+
+    def predict(self, X):
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1))
+
+
+def _as_float32_matrix(X):
+    # sklearn evaluates trees on float32 inputs; matching that keeps every split identical
+    X = np.asarray(X, dtype=np.float32)
+    if X.ndim == 1:
+        X = X.reshape(1, -1)
+    return X
+
+
+def _round_down_float32(threshold):
+    """Largest float32 <= threshold, so float32 x > result exactly when x > threshold"""
+    rounded = threshold.astype(np.float32)
+    too_high = rounded > threshold
+    rounded[too_high] = np.nextafter(rounded[too_high], np.float32(-np.inf))
+    return rounded
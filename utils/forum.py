@@ -1,21 +1,127 @@
 import json
 import os
-from datetime import datetime
 import re
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from utils.metrics import registry
 
+FORUM_DB_FILE = "forum.db"
+# Posts were kept in this JSON file before the SQLite store; it is imported once
 FORUM_FILE = "forum_data.json"
+# None keeps every post; search and paging no longer need the old 100-post cap
+MAX_FORUM_POSTS = None
+# Distinct (limit, offset, topic) listings kept in memory per store
+READ_CACHE_SIZE = 64
+SCHEMA_VERSION = 4
+
+# Statements are listed one by one because trigger bodies contain semicolons
+SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS posts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        topic TEXT NOT NULL,
+        message TEXT NOT NULL,
+        timestamp TEXT NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS posts_timestamp ON posts (timestamp)",
+    "CREATE INDEX IF NOT EXISTS posts_topic ON posts (topic, id)",
+    """CREATE TABLE IF NOT EXISTS replies (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        post_id INTEGER NOT NULL REFERENCES posts (id) ON DELETE CASCADE,
+        name TEXT NOT NULL,
+        message TEXT NOT NULL,
+        timestamp TEXT NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS replies_post_id ON replies (post_id, id)",
+)
+
+# Listings are newest first by post date (bulk imports carry their original
+# dates), with the id breaking ties; posts_timestamp covers the unfiltered listing
+LISTING_SCHEMA = (
+    "CREATE INDEX IF NOT EXISTS posts_topic_timestamp ON posts (topic, timestamp)",
+)
+
+# FTS5 index over topic and message that reads the text from the posts table;
+# triggers keep it in step with every insert, update and delete. Marks (M*)
+# count as word characters, so Telugu vowel signs and viramas stay inside
+# their word instead of splitting it into fragments
+SEARCH_SCHEMA = (
+    """CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5 (
+        topic, message, content='posts', content_rowid='id',
+        tokenize="unicode61 remove_diacritics 2 categories 'L* N* Co M*'"
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS posts_fts_insert AFTER INSERT ON posts BEGIN
+        INSERT INTO posts_fts (rowid, topic, message) VALUES (new.id, new.topic, new.message);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS posts_fts_delete AFTER DELETE ON posts BEGIN
+        INSERT INTO posts_fts (posts_fts, rowid, topic, message) VALUES ('delete', old.id, old.topic, old.message);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS posts_fts_update AFTER UPDATE ON posts BEGIN
+        INSERT INTO posts_fts (posts_fts, rowid, topic, message) VALUES ('delete', old.id, old.topic, old.message);
+        INSERT INTO posts_fts (rowid, topic, message) VALUES (new.id, new.topic, new.message);
+    END""",
+    "INSERT INTO posts_fts (posts_fts) VALUES ('rebuild')",
+)
+# bm25 column weights: a match in the topic counts twice as much as one in the message
+SEARCH_WEIGHTS = (2.0, 1.0)
+
+# Same tags as before; strip_tags only runs it where a closing '>' exists
+_TAG_RE = re.compile(r'<[^>]+>')
+
+def strip_tags(text):
+    """Remove <...> tags in linear time.
+
+    Past the last '>' nothing can match, and scanning that tail from every '<'
+    is what made the plain pattern quadratic on inputs like '<<<<...'.
+    """
+    end = text.rfind('>') + 1
+    if not end:
+        return text
+    return _TAG_RE.sub('', text[:end]) + text[end:]
 
 def sanitize_input(text, max_length=500):
     if not text or not isinstance(text, str):
         return ""
     text = text.strip()[:max_length]
-    text = re.sub(r'<[^>]+>', '', text)
+    text = strip_tags(text)
     return text
 
-def load_forum_data():
-    if os.path.exists(FORUM_FILE):
+def validate_post(name, topic, message):
+    """Sanitized (name, topic, message) and None, or None and the reason it was rejected"""
+    name = sanitize_input(name, 100)
+    topic = sanitize_input(topic, 200)
+    message = sanitize_input(message, 1000)
+
+    if not name or not topic or not message:
+        return None, "Please fill in all fields"
+    if len(name) < 2:
+        return None, "Name must be at least 2 characters"
+    if len(topic) < 5:
+        return None, "Topic must be at least 5 characters"
+    if len(message) < 10:
+        return None, "Message must be at least 10 characters"
+    return (name, topic, message), None
+
+def parse_timestamp(value):
+    """A datetime or "%Y-%m-%d %H:%M:%S" string in the stored format, or None if invalid"""
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    try:
+        return datetime.strptime(str(value).strip(), "%Y-%m-%d %H:%M:%S").strftime("%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        return None
+
+def now_timestamp():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+def load_forum_data(path=FORUM_FILE):
+    """Posts from the legacy JSON file, newest first"""
+    if os.path.exists(path):
         try:
-            with open(FORUM_FILE, 'r', encoding='utf-8') as f:
+            with open(path, 'r', encoding='utf-8') as f:
                 data = json.load(f)
                 if isinstance(data, list):
                     return data
@@ -23,43 +129,388 @@ def load_forum_data():
             pass
     return []
 
-def save_forum_data(data):
+def search_expression(query):
+    """FTS5 expression matching posts that contain every word of query, as a prefix"""
+    terms = query.replace('"', " ").split()
+    return " ".join(f'"{term}"*' for term in terms)
+
+class ForumStore:
+    """Forum posts and replies in SQLite (WAL), safe for concurrent writers.
+
+    AUTOINCREMENT ids only ever grow, even after old posts are pruned, so an
+    id never points at two different posts.
+
+    Listings are cached in memory and shared by every thread (every Streamlit
+    session) in the process. A cached listing is reused while the store's
+    version is unchanged: a generation counter bumped by this process's writes
+    plus SQLite's data_version, which moves when another process commits.
+    Cached posts are shared objects and must not be modified by callers.
+    """
+
+    def __init__(self, path=FORUM_DB_FILE, max_posts=MAX_FORUM_POSTS, legacy_path=FORUM_FILE,
+                 read_cache=True):
+        self.path = path
+        self.max_posts = max_posts
+        self.legacy_path = legacy_path
+        self.read_cache = read_cache
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._generation = 0
+        self._watcher = None
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            if conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+                self._initialize(conn)
+            self._local.conn = conn
+        return conn
+
+    def _initialize(self, conn):
+        # IMMEDIATE takes the write lock up front, so when several processes
+        # start together exactly one of them creates the schema and imports
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version < 1:
+                for statement in SCHEMA:
+                    conn.execute(statement)
+                if self.legacy_path:
+                    self._import_posts(conn, load_forum_data(self.legacy_path))
+            if version < 3:
+                for statement in LISTING_SCHEMA:
+                    conn.execute(statement)
+            if version < 4:
+                # Indexes built before version 4 split Telugu words; drop and rebuild
+                conn.execute("DROP TABLE IF EXISTS posts_fts")
+                for statement in SEARCH_SCHEMA:
+                    conn.execute(statement)
+            if version < SCHEMA_VERSION:
+                conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _import_posts(self, conn, posts):
+        # Legacy ids came from len(posts) + 1 and can repeat, so rows get new
+        # ids, assigned oldest first to keep the original order
+        imported = 0
+        for post in reversed(posts):
+            if not isinstance(post, dict) or not all(post.get(k) for k in ("name", "topic", "message")):
+                continue
+            timestamp = post.get("timestamp") or now_timestamp()
+            cursor = conn.execute(
+                "INSERT INTO posts (name, topic, message, timestamp) VALUES (?, ?, ?, ?)",
+                (post["name"], post["topic"], post["message"], timestamp),
+            )
+            for reply in post.get("replies") or []:
+                if isinstance(reply, dict) and reply.get("name") and reply.get("message"):
+                    conn.execute(
+                        "INSERT INTO replies (post_id, name, message, timestamp) VALUES (?, ?, ?, ?)",
+                        (cursor.lastrowid, reply["name"], reply["message"], reply.get("timestamp") or timestamp),
+                    )
+            imported += 1
+        return imported
+
+    def _bump(self):
+        with self._cache_lock:
+            self._generation += 1
+
+    def version(self):
+        """Changes whenever any connection, in this process or another, commits a write"""
+        self._connect()
+        with self._cache_lock:
+            if self._watcher is None:
+                # Never written through, so its data_version moves on every commit elsewhere
+                self._watcher = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            return self._generation, self._watcher.execute("PRAGMA data_version").fetchone()[0]
+
+    def _cached(self, key, read):
+        if not self.read_cache:
+            return read()
+        # The version is taken before reading, so a write that lands during
+        # the read leaves a stale version behind and forces a re-read next time
+        version = self.version()
+        with self._cache_lock:
+            entry = self._cache.get(key)
+            if entry is not None and entry[0] == version:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        value = read()
+        with self._cache_lock:
+            self._cache[key] = (version, value)
+            self._cache.move_to_end(key)
+            while len(self._cache) > READ_CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return value
+
+    def cache_stats(self):
+        with self._cache_lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self._cache),
+            }
+
+    def migrate_json(self, path=FORUM_FILE):
+        """Import a legacy JSON file into the store; returns the number of posts added"""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            imported = self._import_posts(conn, load_forum_data(path))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self._bump()
+        return imported
+
+    def _prune(self, conn):
+        if self.max_posts:
+            conn.execute(
+                "DELETE FROM posts WHERE id NOT IN (SELECT id FROM posts ORDER BY timestamp DESC, id DESC LIMIT ?)",
+                (self.max_posts,),
+            )
+
+    def add_post(self, name, topic, message):
+        """Insert a post and return its id"""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            cursor = conn.execute(
+                "INSERT INTO posts (name, topic, message, timestamp) VALUES (?, ?, ?, ?)",
+                (name, topic, message, now_timestamp()),
+            )
+            self._prune(conn)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self._bump()
+        return cursor.lastrowid
+
+    def add_posts(self, rows):
+        """Insert (name, topic, message, timestamp) rows in one transaction; returns the count.
+
+        rows may be a generator: it is consumed once, inside the transaction,
+        so a large import never has to be held in memory.
+        """
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            cursor = conn.executemany(
+                "INSERT INTO posts (name, topic, message, timestamp) VALUES (?, ?, ?, ?)", rows
+            )
+            self._prune(conn)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self._bump()
+        return cursor.rowcount
+
+    def add_reply(self, post_id, name, message):
+        """Insert a reply and return its id; raises sqlite3.IntegrityError for an unknown post"""
+        cursor = self._connect().execute(
+            "INSERT INTO replies (post_id, name, message, timestamp) VALUES (?, ?, ?, ?)",
+            (int(post_id), name, message, now_timestamp()),
+        )
+        self._bump()
+        return cursor.lastrowid
+
+    def get_posts(self, limit=10, offset=0, topic=None):
+        """One page of posts, newest first, each with its replies oldest first"""
+        return self._cached(("posts", limit, offset, topic), lambda: self._read_posts(limit, offset, topic))
+
+    def _read_posts(self, limit, offset, topic):
+        conn = self._connect()
+        if topic:
+            rows = conn.execute(
+                "SELECT * FROM posts WHERE topic = ? ORDER BY timestamp DESC, id DESC LIMIT ? OFFSET ?",
+                (topic, limit, offset),
+            ).fetchall()
+        else:
+            rows = conn.execute(
+                "SELECT * FROM posts ORDER BY timestamp DESC, id DESC LIMIT ? OFFSET ?", (limit, offset)
+            ).fetchall()
+
+        return self._with_replies(conn, rows)
+
+    def _with_replies(self, conn, rows):
+        posts = [dict(row, replies=[]) for row in rows]
+        if posts:
+            by_id = {post["id"]: post for post in posts}
+            placeholders = ",".join("?" * len(by_id))
+            for reply in conn.execute(
+                f"SELECT * FROM replies WHERE post_id IN ({placeholders}) ORDER BY id", list(by_id)
+            ):
+                by_id[reply["post_id"]]["replies"].append(dict(reply))
+        return posts
+
+    def count_posts(self, topic=None):
+        return self._cached(("count", topic), lambda: self._count_posts(topic))
+
+    def _count_posts(self, topic):
+        conn = self._connect()
+        if topic:
+            return conn.execute("SELECT COUNT(*) FROM posts WHERE topic = ?", (topic,)).fetchone()[0]
+        return conn.execute("SELECT COUNT(*) FROM posts").fetchone()[0]
+
+    def search(self, query, limit=10, offset=0):
+        """Posts matching every word of query, best match first"""
+        expression = search_expression(query)
+        if not expression:
+            return []
+        return self._cached(("search", expression, limit, offset),
+                            lambda: self._search(expression, limit, offset))
+
+    def _search(self, expression, limit, offset):
+        conn = self._connect()
+        # Rank inside the FTS table alone and join only the page that is kept
+        ids = [row[0] for row in conn.execute(
+            "SELECT rowid FROM posts_fts WHERE posts_fts MATCH ? "
+            "ORDER BY bm25(posts_fts, ?, ?), rowid DESC LIMIT ? OFFSET ?",
+            (expression, *SEARCH_WEIGHTS, limit, offset),
+        )]
+        if not ids:
+            return []
+        placeholders = ",".join("?" * len(ids))
+        rows = {row["id"]: row for row in conn.execute(f"SELECT * FROM posts WHERE id IN ({placeholders})", ids)}
+        return self._with_replies(conn, [rows[post_id] for post_id in ids if post_id in rows])
+
+    def count_matches(self, query):
+        expression = search_expression(query)
+        if not expression:
+            return 0
+        return self._cached(("search_count", expression), lambda: self._connect().execute(
+            "SELECT COUNT(*) FROM posts_fts WHERE posts_fts MATCH ?", (expression,)
+        ).fetchone()[0])
+
+forum_store = ForumStore()
+registry.register_stats("forum_cache", forum_store.cache_stats)
+
+def add_forum_post(name, topic, message):
+    post, error = validate_post(name, topic, message)
+    if error:
+        return False
+
     try:
-        with open(FORUM_FILE, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        forum_store.add_post(*post)
         return True
-    except IOError:
+    except sqlite3.Error:
         return False
 
-def add_forum_post(name, topic, message):
+def bulk_add_forum_posts(posts, store=None):
+    """Validate and insert many posts in a single transaction.
+
+    posts is an iterable of dicts with name, topic, message and an optional
+    timestamp ("%Y-%m-%d %H:%M:%S" or datetime; defaults to now). Returns
+    ({"accepted": count, "rejected": [{"row": index, "reason": text}, ...]}, error);
+    on a database error nothing is written and error says why.
+    """
+    rejected = []
+
+    def rows():
+        default_timestamp = now_timestamp()
+        for index, item in enumerate(posts):
+            if not isinstance(item, dict):
+                rejected.append({"row": index, "reason": "Row is not an object"})
+                continue
+            post, error = validate_post(item.get("name"), item.get("topic"), item.get("message"))
+            if error:
+                rejected.append({"row": index, "reason": error})
+                continue
+            timestamp = default_timestamp
+            if item.get("timestamp"):
+                timestamp = parse_timestamp(item["timestamp"])
+                if timestamp is None:
+                    rejected.append({"row": index, "reason": "Invalid timestamp, expected YYYY-MM-DD HH:MM:SS"})
+                    continue
+            yield post + (timestamp,)
+
+    try:
+        accepted = (store or forum_store).add_posts(rows())
+    except sqlite3.Error as e:
+        return {"accepted": 0, "rejected": rejected}, f"Database error: {str(e)}"
+    return {"accepted": accepted, "rejected": rejected}, None
+
+def add_forum_reply(post_id, name, message):
     name = sanitize_input(name, 100)
-    topic = sanitize_input(topic, 200)
     message = sanitize_input(message, 1000)
-    
-    if not name or not topic or not message:
+
+    if len(name) < 2 or len(message) < 2:
         return False
-    
-    if len(name) < 2 or len(topic) < 5 or len(message) < 10:
+
+    try:
+        forum_store.add_reply(post_id, name, message)
+        return True
+    except (sqlite3.Error, ValueError, TypeError):
         return False
-    
-    posts = load_forum_data()
-    
-    new_post = {
-        "id": len(posts) + 1,
-        "name": name,
-        "topic": topic,
-        "message": message,
-        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        "replies": []
-    }
-    
-    posts.insert(0, new_post)
-    
-    if len(posts) > 100:
-        posts = posts[:100]
-    
-    return save_forum_data(posts)
-
-def get_forum_posts(limit=10):
-    posts = load_forum_data()
-    return posts[:limit]
+
+def get_forum_posts(limit=10, offset=0, topic=None):
+    try:
+        return forum_store.get_posts(limit, offset, topic)
+    except sqlite3.Error:
+        return []
+
+def count_forum_posts(topic=None):
+    try:
+        return forum_store.count_posts(topic)
+    except sqlite3.Error:
+        return 0
+
+def search_forum_posts(query, limit=10, offset=0):
+    try:
+        return forum_store.search(query, limit, offset)
+    except sqlite3.Error:
+        return []
+
+def count_forum_matches(query):
+    try:
+        return forum_store.count_matches(query)
+    except sqlite3.Error:
+        return 0
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Import forum posts into the SQLite store")
+    parser.add_argument("json_file", nargs="?", default=FORUM_FILE)
+    parser.add_argument("--db", default=FORUM_DB_FILE)
+    parser.add_argument("--ingest", action="store_true",
+                        help="treat json_file as JSON Lines of new posts: validate each one and report rejections")
+    args = parser.parse_args()
+
+    # legacy_path=None: import only what was asked for, not the default file as well
+    store = ForumStore(args.db, legacy_path=None)
+    if not args.ingest:
+        print(f"Imported {store.migrate_json(args.json_file)} posts from {args.json_file} into {args.db}")
+    else:
+        def read_lines(f):
+            for line in f:
+                if line.strip():
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        yield None
+
+        with open(args.json_file, "r", encoding="utf-8") as f:
+            report, error = bulk_add_forum_posts(read_lines(f), store)
+        if error:
+            raise SystemExit(error)
+        for rejection in report["rejected"]:
+            print(f"row {rejection['row']}: {rejection['reason']}")
+        print(f"Imported {report['accepted']} posts, rejected {len(report['rejected'])}")
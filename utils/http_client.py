@@ -0,0 +1,237 @@
+"""Shared HTTP client for every outbound call (OpenWeather, Hugging Face).
+
+One requests.Session keeps pooled keep-alive connections per host. Each
+request gets the endpoint's timeout, a few retries with jittered exponential
+backoff on connection errors and retryable statuses, and a per-host circuit
+breaker so a dead upstream fails fast instead of stalling a script run.
+
+A read timeout is only retried for idempotent methods: a POST that timed out
+may still be running upstream, and retrying it would triple the stall. Every
+failed attempt counts toward the breaker.
+
+A stream=True request stays in the in-flight gauge and its latency keeps
+running until the response is closed, so a streamed answer is measured with
+its generation time; callers must close streamed responses.
+"""
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils.metrics import UPSTREAM_ERRORS, UPSTREAM_IN_FLIGHT, UPSTREAM_REQUESTS, UPSTREAM_SECONDS
+
+# (connect, read) timeouts in seconds, by host
+DEFAULT_TIMEOUT = (3.05, 10)
+ENDPOINT_TIMEOUTS = {
+    "api.openweathermap.org": (3.05, 5),
+    "api-inference.huggingface.co": (3.05, 30),
+}
+
+MAX_RETRIES = 2
+BACKOFF_BASE = 0.25
+BACKOFF_MAX = 4.0
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
+# Failed attempts in a row (retries included) that open a host's circuit
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_RESET_TIMEOUT = 30
+
+POOL_CONNECTIONS = 10
+POOL_MAXSIZE = 20
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """Raised without touching the network while a host's circuit is open"""
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures, then lets one trial call through after a cool-down"""
+
+    def __init__(self, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_timeout=BREAKER_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                return "half-open"
+            return "open"
+
+    @property
+    def closed(self):
+        with self._lock:
+            return self.opened_at is None
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_timeout or self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def retry_after(self):
+        with self._lock:
+            if self.opened_at is None:
+                return 0.0
+            return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+def finish_request(host, start, outcome):
+    UPSTREAM_IN_FLIGHT.dec(host=host)
+    UPSTREAM_SECONDS.observe(time.perf_counter() - start, host=host)
+    UPSTREAM_REQUESTS.inc(host=host, outcome=outcome)
+    if not outcome.isdigit() or int(outcome) >= 400:
+        UPSTREAM_ERRORS.inc(host=host)
+
+
+def finish_on_close(response, host, start, outcome):
+    """Record the request when response is first closed"""
+    close = response.close
+    lock = threading.Lock()
+    pending = [True]
+
+    def close_and_finish():
+        with lock:
+            first, pending[0] = pending[0], False
+        try:
+            close()
+        finally:
+            if first:
+                finish_request(host, start, outcome)
+
+    response.close = close_and_finish
+
+
+class HttpClient:
+    def __init__(self, timeouts=None, max_retries=MAX_RETRIES, backoff_base=BACKOFF_BASE,
+                 backoff_max=BACKOFF_MAX, failure_threshold=BREAKER_FAILURE_THRESHOLD,
+                 reset_timeout=BREAKER_RESET_TIMEOUT):
+        self.timeouts = dict(ENDPOINT_TIMEOUTS if timeouts is None else timeouts)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.session = requests.Session()
+        # Retries are handled below so they share the backoff and breaker logic
+        adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._breakers = {}
+        self._breakers_lock = threading.Lock()
+
+    def breaker(self, host):
+        with self._breakers_lock:
+            if host not in self._breakers:
+                self._breakers[host] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            return self._breakers[host]
+
+    def timeout_for(self, host):
+        return self.timeouts.get(host, DEFAULT_TIMEOUT)
+
+    def retryable(self, method, error):
+        """Whether an attempt that raised error may be sent again"""
+        if isinstance(error, requests.ConnectionError):
+            # Includes ConnectTimeout: the request never reached the server
+            return True
+        if isinstance(error, (requests.Timeout, requests.exceptions.ChunkedEncodingError)):
+            return method.upper() in IDEMPOTENT_METHODS
+        return False
+
+    def backoff(self, attempt, response=None):
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, min(self.backoff_max, float(retry_after)))
+        return delay
+
+    def request(self, method, url, timeout=None, retries=None, **kwargs):
+        host = urlsplit(url).hostname
+        UPSTREAM_IN_FLIGHT.inc(host=host)
+        start = time.perf_counter()
+        outcome = "error"
+        streaming = False
+        try:
+            response = self._request(host, method, url, timeout, retries, **kwargs)
+            outcome = str(response.status_code)
+            if kwargs.get("stream"):
+                # Only the headers are in; the request is finished when the body is closed
+                finish_on_close(response, host, start, outcome)
+                streaming = True
+            return response
+        except CircuitOpenError:
+            outcome = "circuit_open"
+            raise
+        finally:
+            if not streaming:
+                finish_request(host, start, outcome)
+
+    def _request(self, host, method, url, timeout, retries, **kwargs):
+        breaker = self.breaker(host)
+        if not breaker.allow():
+            raise CircuitOpenError(f"{host} is unavailable, retrying in {breaker.retry_after():.0f}s")
+
+        retries = self.max_retries if retries is None else retries
+        timeout = timeout or self.timeout_for(host)
+        for attempt in range(retries + 1):
+            recorded = False
+            try:
+                try:
+                    response = self.session.request(method, url, timeout=timeout, **kwargs)
+                except requests.RequestException as e:
+                    breaker.record_failure()
+                    recorded = True
+                    if attempt == retries or not self.retryable(method, e) or not breaker.closed:
+                        raise
+                    time.sleep(self.backoff(attempt))
+                    continue
+
+                if response.status_code not in RETRY_STATUSES:
+                    breaker.record_success()
+                    recorded = True
+                    return response
+                breaker.record_failure()
+                recorded = True
+                if attempt == retries or not breaker.closed:
+                    return response
+                response.close()
+                time.sleep(self.backoff(attempt, response))
+            finally:
+                # Anything else escaping still ends the attempt, so a half-open trial is never left hanging
+                if not recorded:
+                    breaker.record_failure()
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+
+http_client = HttpClient()
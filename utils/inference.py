@@ -0,0 +1,278 @@
+"""Streaming text generation from the Hugging Face inference endpoints.
+
+With "stream": true the endpoint answers with server-sent events, one per
+generated token. stream_generated_text yields each token's text as soon as
+its event arrives, so the chat can show the first words while the rest of
+the answer is still being generated.
+
+All model calls go through inference_gate. Concurrent callers asking for the
+same prompt share one upstream request (single flight), and a semaphore
+bounds how many requests are sent to the endpoint at once; the rest queue.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from utils.http_client import http_client
+from utils.insight_cache import insight_cache
+from utils.metrics import STAGE_SECONDS, registry, stage
+
+STREAM_PARAMETERS = {"max_new_tokens": 700, "return_full_text": False}
+# Upstream requests allowed at once across all sessions
+LLM_MAX_CONCURRENT = 4
+# Queue wait times kept for the percentiles in InferenceGate.stats()
+WAIT_SAMPLES = 512
+# How often waiting threads wake up to check for cancellation
+POLL_SECONDS = 0.25
+
+LLM_ERRORS = registry.counter("llm_errors_total", "Model calls that ended in an error")
+
+
+class GenerationError(Exception):
+    pass
+
+
+def iter_sse_data(chunks):
+    """The data payload of each server-sent event in a stream of byte chunks"""
+    buffer = b""
+    data = []
+    for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line = line.rstrip(b"\r").decode("utf-8")
+            if not line:
+                if data:
+                    yield "\n".join(data)
+                    data = []
+                continue
+            field, _, value = line.partition(":")
+            if field == "data":
+                data.append(value[1:] if value.startswith(" ") else value)
+    if buffer.strip():
+        field, _, value = buffer.decode("utf-8").partition(":")
+        if field == "data":
+            data.append(value.strip())
+    if data:
+        yield "\n".join(data)
+
+
+def stream_generated_text(api_url, api_token, prompt, cancel=None, parameters=None):
+    """Yield generated text piece by piece; stops early once cancel (a threading.Event) is set.
+
+    Closing the generator, or cancelling, closes the HTTP response, so an
+    abandoned answer stops being downloaded.
+    """
+    response = http_client.post(
+        api_url,
+        headers={"Authorization": f"Bearer {api_token}", "Accept": "text/event-stream"},
+        json={"inputs": prompt, "parameters": parameters or STREAM_PARAMETERS, "stream": True},
+        stream=True,
+    )
+    try:
+        if response.status_code != 200:
+            raise GenerationError(f"Unable to fetch agricultural insights. Status: {response.status_code}")
+        # chunk_size=None hands over each chunk as it arrives instead of waiting to fill a buffer
+        for data in iter_sse_data(response.iter_content(chunk_size=None)):
+            if cancel is not None and cancel.is_set():
+                return
+            if data == "[DONE]":
+                return
+            event = json.loads(data)
+            if event.get("error"):
+                raise GenerationError(f"Error fetching insights: {event['error']}")
+            token = event.get("token") or {}
+            if token.get("text") and not token.get("special"):
+                yield token["text"]
+    finally:
+        response.close()
+
+
+class Flight:
+    """One upstream call and the pieces it has produced so far"""
+
+    def __init__(self):
+        self.parts = []
+        self.done = False
+        self.error = None
+        self.subscribers = 0
+        self.cancel = threading.Event()
+        self.changed = threading.Condition()
+
+
+class InferenceGate:
+    """Single-flight deduplication and a concurrency limit for model calls, shared by all threads"""
+
+    def __init__(self, max_concurrent=LLM_MAX_CONCURRENT):
+        self.max_concurrent = max_concurrent
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._flights = {}
+        self._lock = threading.Lock()
+        self._waits = deque(maxlen=WAIT_SAMPLES)
+        self.requests = 0
+        self.coalesced = 0
+        self.upstream = 0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.in_flight = 0
+
+    def stream(self, key, produce, cancel=None):
+        """Yield the pieces of produce(cancel_event) for key.
+
+        The first caller for a key starts produce on a worker thread once a
+        slot is free; callers arriving while it runs follow the same flight
+        and receive every piece from the start. The upstream call is only
+        cancelled when every caller has stopped listening.
+        """
+        with self._lock:
+            self.requests += 1
+            flight = self._flights.get(key)
+            if flight is None or flight.cancel.is_set():
+                flight = self._flights[key] = Flight()
+                threading.Thread(target=self._run, args=(key, flight, produce), daemon=True).start()
+            else:
+                self.coalesced += 1
+            flight.subscribers += 1
+
+        index = 0
+        try:
+            while True:
+                with flight.changed:
+                    while index == len(flight.parts) and not flight.done:
+                        if cancel is not None and cancel.is_set():
+                            return
+                        flight.changed.wait(POLL_SECONDS)
+                    pieces = flight.parts[index:]
+                    done, error = flight.done, flight.error
+                index += len(pieces)
+                for piece in pieces:
+                    if cancel is not None and cancel.is_set():
+                        return
+                    yield piece
+                if done:
+                    if error is not None:
+                        raise error
+                    return
+        finally:
+            with self._lock:
+                flight.subscribers -= 1
+                if flight.subscribers == 0 and not flight.done:
+                    flight.cancel.set()
+
+    def _run(self, key, flight, produce):
+        queued = time.perf_counter()
+        with self._lock:
+            self.waiting += 1
+            self.max_waiting = max(self.max_waiting, self.waiting)
+        acquired = False
+        try:
+            # Everyone may stop listening while the flight is still queued
+            while not flight.cancel.is_set() and not acquired:
+                acquired = self._slots.acquire(timeout=POLL_SECONDS)
+            waited = time.perf_counter() - queued
+            STAGE_SECONDS.observe(waited, stage="llm_queue_wait")
+            with self._lock:
+                self.waiting -= 1
+                self._waits.append(waited)
+                if acquired:
+                    self.in_flight += 1
+                    self.upstream += 1
+            if acquired:
+                with stage("llm_generate"):
+                    for piece in produce(flight.cancel):
+                        with flight.changed:
+                            flight.parts.append(piece)
+                            flight.changed.notify_all()
+        except Exception as e:
+            LLM_ERRORS.inc()
+            flight.error = e
+        finally:
+            with self._lock:
+                if acquired:
+                    self.in_flight -= 1
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+            if acquired:
+                self._slots.release()
+            with flight.changed:
+                flight.done = True
+                flight.changed.notify_all()
+
+    def stats(self):
+        with self._lock:
+            waits = np.array(self._waits) * 1000
+            stats = {
+                "requests": self.requests,
+                "coalesced": self.coalesced,
+                "upstream": self.upstream,
+                "in_flight": self.in_flight,
+                "queue_depth": self.waiting,
+                "max_queue_depth": self.max_waiting,
+                "max_concurrent": self.max_concurrent,
+            }
+        if len(waits):
+            stats["wait_ms_p50"], stats["wait_ms_p95"] = np.percentile(waits, (50, 95)).tolist()
+            stats["wait_ms_max"] = float(waits.max())
+        return stats
+
+
+inference_gate = InferenceGate()
+registry.register_stats("llm", inference_gate.stats)
+
+
+def insight_producer(api_url, api_token, prompt, cache=None, cache_key=None):
+    """produce function for inference_gate that streams the model's answer to prompt
+    and stores it in cache once it has streamed to the end
+    """
+    def produce(flight_cancel):
+        # An identical flight may have finished while this one was queued
+        cached = cache.get(cache_key) if cache is not None else None
+        if cached is not None:
+            yield cached
+            return
+        parts = []
+        for text in stream_generated_text(api_url, api_token, prompt, flight_cancel):
+            parts.append(text)
+            yield text
+        if cache is not None and parts and not flight_cancel.is_set():
+            cache.set(cache_key, "".join(parts))
+
+    return produce
+
+
+def stream_insight(api_url, api_token, prompt, cache=None, cache_key=None, cancel=None):
+    """stream_generated_text for the UI, through inference_gate: failures become a final
+    message instead of an exception, and an answer that streamed to the end is stored in
+    cache under cache_key.
+    """
+    produce = insight_producer(api_url, api_token, prompt, cache, cache_key)
+    try:
+        yield from inference_gate.stream(cache_key or (api_url, prompt), produce, cancel)
+    except GenerationError as e:
+        yield str(e)
+    except Exception as e:
+        yield f"Error fetching insights: {str(e)}"
+
+
+def run_insight_job(payload, cancel):
+    """Background job handler: the model's answer to payload["prompt"], cached under payload["cache_key"]"""
+    api_token = os.getenv("HUGGINGFACE_API_TOKEN")
+    if not api_token:
+        raise GenerationError("AI chatbot not configured. Please add HUGGINGFACE_API_TOKEN.")
+    cache_key = payload["cache_key"]
+    produce = insight_producer(payload["api_url"], api_token, payload["prompt"], insight_cache, cache_key)
+    text = "".join(inference_gate.stream(cache_key, produce, cancel))
+    if not text:
+        raise GenerationError("Unable to fetch agricultural insights.")
+    return text
+
+
+def collect(chunks, parts):
+    """Yield chunks while appending each to parts, which keeps what was shown if the run is interrupted"""
+    for chunk in chunks:
+        parts.append(chunk)
+        yield chunk
@@ -0,0 +1,128 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from utils.metrics import registry
+
+INSIGHT_CACHE_FILE = "insight_cache.db"
+INSIGHT_CACHE_TTL = 7 * 24 * 3600
+INSIGHT_CACHE_MAX_ENTRIES = 5000
+
+# Bucket width per feature (N, P, K, temperature, humidity, ph, rainfall).
+# With INSIGHT_CACHE_BUCKETS on, readings are rounded to these buckets before
+# the prompt is built, so readings inside one bucket share a cache entry. Off
+# by default: the model is then told the readings exactly as entered.
+FEATURE_BUCKETS = (5.0, 5.0, 5.0, 0.5, 1.0, 0.1, 5.0)
+INSIGHT_CACHE_BUCKETS = os.getenv("INSIGHT_CACHE_BUCKETS", "0").lower() not in ("0", "false", "no", "off")
+
+
+def quantize_features(features, buckets=FEATURE_BUCKETS):
+    return [round(round(float(value) / bucket) * bucket, 6) for value, bucket in zip(features, buckets)]
+
+
+def prompt_cache_key(model, prompt):
+    normalized = " ".join(prompt.split()).casefold()
+    payload = json.dumps({"model": model, "prompt": normalized}, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class InsightCache:
+    """SQLite-backed insight cache with LRU eviction and a TTL, shared by all threads"""
+
+    def __init__(self, path=INSIGHT_CACHE_FILE, ttl=INSIGHT_CACHE_TTL, max_entries=INSIGHT_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS insights ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS insights_accessed_at ON insights (accessed_at)")
+            conn.commit()
+            self._local.conn = conn
+        return conn
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key):
+        try:
+            conn = self._connect()
+            row = conn.execute("SELECT value, created_at FROM insights WHERE key = ?", (key,)).fetchone()
+            now = time.time()
+            if row is None or now - row[1] > self.ttl:
+                if row is not None:
+                    with conn:
+                        conn.execute("DELETE FROM insights WHERE key = ?", (key,))
+                self._count(False)
+                return None
+            with conn:
+                conn.execute("UPDATE insights SET accessed_at = ? WHERE key = ?", (now, key))
+            self._count(True)
+            return row[0]
+        except sqlite3.Error:
+            self._count(False)
+            return None
+
+    def set(self, key, value):
+        try:
+            conn = self._connect()
+            now = time.time()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO insights (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                    (key, value, now, now),
+                )
+                conn.execute(
+                    "DELETE FROM insights WHERE key IN "
+                    "(SELECT key FROM insights ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+            return True
+        except sqlite3.Error:
+            return False
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM insights")
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        try:
+            size = self._connect().execute("SELECT COUNT(*) FROM insights").fetchone()[0]
+        except sqlite3.Error:
+            size = None
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "size": size,
+        }
+
+
+insight_cache = InsightCache()
+registry.register_stats("insight_cache", insight_cache.stats)
@@ -0,0 +1,232 @@
+"""Precomputed per-crop, per-language insight documents.
+
+`python -m utils.insight_catalog build` writes insight_catalog.json. Each
+document is the curated guidance in insights/<lang>/<crop>.md (or, with
+--generate, text from the insight model for crops that have none) followed by
+the crop's typical conditions in Crop_recommendation.csv. The apps read the
+catalog once and serve these documents without any network call; the model is
+only asked free-form chat questions.
+"""
+import csv
+import json
+import os
+import threading
+import time
+from types import MappingProxyType
+
+import numpy as np
+
+from utils.predictor import FEATURE_NAMES
+from utils.translations import available_languages, get_catalog
+
+INSIGHT_CATALOG_FILE = "insight_catalog.json"
+CURATED_DIR = "insights"
+DATASET_FILE = "Crop_recommendation.csv"
+FORMAT_NAME = "crop-insight-catalog"
+FORMAT_VERSION = 1
+
+INSIGHT_MODEL_URL = "https://api-inference.huggingface.co/models/mistralai/Mistral-Nemo-Instruct-2407"
+# Typical conditions are the middle 80% of each crop's rows
+RANGE_PERCENTILES = (10, 90)
+# Translation keys of the feature labels, in FEATURE_NAMES order
+FEATURE_TEXT_KEYS = ("nitrogen", "phosphorus", "potassium", "temperature", "humidity", "ph", "rainfall")
+
+
+def crop_key(crop):
+    return str(crop).strip().casefold()
+
+
+def guidance_prompt(crop, lang="en"):
+    prompt = f"""Provide detailed agricultural guidance for {crop} cultivation,
+    focusing on:
+    1. Optimal cultivation process
+    2. Recommended fertilizers
+    3. Pest prevention strategies
+    4. Best cultivation seasons
+    5. Key growth requirements"""
+    if lang != "en":
+        prompt += f"\n\n    Please provide the response in {get_catalog(lang)['language_name']} language."
+    return prompt
+
+
+def dataset_ranges(path=DATASET_FILE):
+    """{crop key: (row count, [(low, high) per feature])} from the training CSV"""
+    rows = {}
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        for record in csv.DictReader(f):
+            rows.setdefault(crop_key(record["label"]), []).append([float(record[name]) for name in FEATURE_NAMES])
+
+    ranges = {}
+    for crop, values in rows.items():
+        low, high = np.percentile(np.array(values), RANGE_PERCENTILES, axis=0)
+        ranges[crop] = (len(values), list(zip(low.tolist(), high.tolist())))
+    return ranges
+
+
+def format_conditions(crop, lang, count, ranges):
+    text = get_catalog(lang)
+    lines = [f"**{text['typical_conditions']}** — "
+             f"{text['typical_conditions_desc'].format(count=count, crop=crop)}"]
+    for key, (low, high) in zip(FEATURE_TEXT_KEYS, ranges):
+        digits = 1 if key in ("temperature", "ph") else 0
+        lines.append(f"- {text[key]}: {low:.{digits}f}–{high:.{digits}f}")
+    return "\n".join(lines)
+
+
+def read_curated(lang, crop, curated_dir=CURATED_DIR):
+    try:
+        with open(os.path.join(curated_dir, lang, f"{crop}.md"), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def generate_guidance(crop, lang, api_token):
+    from utils.http_client import http_client
+
+    response = http_client.post(
+        INSIGHT_MODEL_URL,
+        headers={"Authorization": f"Bearer {api_token}"},
+        json={"inputs": guidance_prompt(crop, lang), "parameters": {"return_full_text": False, "max_new_tokens": 800}},
+    )
+    if response.status_code != 200:
+        raise RuntimeError(f"Status {response.status_code}")
+    result = response.json()
+    if not (isinstance(result, list) and result and result[0].get("generated_text")):
+        raise RuntimeError("Empty response")
+    return result[0]["generated_text"].strip()
+
+
+def build_catalog(path=INSIGHT_CATALOG_FILE, dataset=DATASET_FILE, curated_dir=CURATED_DIR,
+                  languages=None, generate=False):
+    """Assemble every (language, crop) document and write the catalog atomically.
+
+    Curated files win. With generate=True, crops without one are filled by the
+    insight model; text generated by an earlier build is reused, so only new
+    gaps cost a model call. Crops with neither are left out and fall back to
+    the model at runtime.
+    """
+    languages = languages or available_languages()
+    ranges = dataset_ranges(dataset)
+    api_token = os.getenv("HUGGINGFACE_API_TOKEN") if generate else None
+    if generate and not api_token:
+        raise RuntimeError("--generate needs HUGGINGFACE_API_TOKEN")
+
+    previous = {}
+    try:
+        previous = read_catalog(path)["documents"]
+    except (OSError, ValueError, KeyError):
+        pass
+
+    documents = {}
+    missing = []
+    for lang in languages:
+        documents[lang] = {}
+        for crop, (count, crop_ranges) in sorted(ranges.items()):
+            name = crop.capitalize()
+            guidance, source = read_curated(lang, crop, curated_dir), "curated"
+            if guidance is None and generate:
+                earlier = previous.get(lang, {}).get(crop, {})
+                if earlier.get("source") == "generated":
+                    guidance, source = earlier["guidance"], "generated"
+                else:
+                    try:
+                        guidance, source = generate_guidance(name, lang, api_token), "generated"
+                    except Exception as e:
+                        print(f"Could not generate {lang}/{crop}: {e}")
+            if guidance is None:
+                missing.append(f"{lang}/{crop}")
+                continue
+            text = "\n\n".join([guidance, format_conditions(name, lang, count, crop_ranges),
+                                f"*{get_catalog(lang)['insight_disclaimer']}*"])
+            documents[lang][crop] = {"text": text, "source": source}
+            if source == "generated":
+                documents[lang][crop]["guidance"] = guidance
+
+    catalog = {
+        "format": FORMAT_NAME,
+        "version": FORMAT_VERSION,
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "dataset": os.path.basename(dataset),
+        "documents": documents,
+    }
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(catalog, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+    return catalog, missing
+
+
+def read_catalog(path=INSIGHT_CATALOG_FILE):
+    with open(path, "r", encoding="utf-8") as f:
+        catalog = json.load(f)
+    if catalog.get("format") != FORMAT_NAME:
+        raise ValueError(f"{path} is not a {FORMAT_NAME} file")
+    if catalog.get("version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported insight catalog version {catalog.get('version')}, expected {FORMAT_VERSION}")
+    return catalog
+
+
+class InsightCatalog:
+    """Read-only document lookup, loaded on first use and shared by all threads"""
+
+    def __init__(self, path=INSIGHT_CATALOG_FILE):
+        self.path = path
+        self._documents = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._documents is None:
+                documents = {}
+                try:
+                    for lang, crops in read_catalog(self.path)["documents"].items():
+                        documents[lang] = MappingProxyType({crop: entry["text"] for crop, entry in crops.items()})
+                except (OSError, ValueError, KeyError) as e:
+                    print(f"Insight catalog unavailable, insights will come from the model: {e}")
+                self._documents = MappingProxyType(documents)
+        return self._documents
+
+    def get(self, crop, lang="en"):
+        """The precomputed document for crop in lang, or None"""
+        documents = self._documents
+        if documents is None:
+            documents = self._load()
+        crops = documents.get(lang)
+        return crops.get(crop_key(crop)) if crops is not None else None
+
+
+insight_catalog = InsightCatalog()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build or inspect the precomputed insight catalog")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build_parser = subparsers.add_parser("build", help="assemble documents from curated files and the dataset")
+    build_parser.add_argument("--out", default=INSIGHT_CATALOG_FILE)
+    build_parser.add_argument("--dataset", default=DATASET_FILE)
+    build_parser.add_argument("--curated", default=CURATED_DIR)
+    build_parser.add_argument("--languages", nargs="+")
+    build_parser.add_argument("--generate", action="store_true",
+                              help="fill crops without a curated file from the insight model (needs HUGGINGFACE_API_TOKEN)")
+    info_parser = subparsers.add_parser("info", help="list the documents in a catalog")
+    info_parser.add_argument("--path", default=INSIGHT_CATALOG_FILE)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        catalog, missing = build_catalog(args.out, args.dataset, args.curated, args.languages, args.generate)
+        for lang, crops in catalog["documents"].items():
+            print(f"{lang}: {len(crops)} documents")
+        if missing:
+            print(f"No document for {len(missing)} (served by the model at runtime): {', '.join(missing)}")
+        print(f"Wrote {args.out}")
+    else:
+        catalog = read_catalog(args.path)
+        print(f"{args.path}, built {catalog['created']} from {catalog['dataset']}")
+        for lang, crops in catalog["documents"].items():
+            sources = {}
+            for entry in crops.values():
+                sources[entry["source"]] = sources.get(entry["source"], 0) + 1
+            print(f"{lang}: {len(crops)} documents ({', '.join(f'{n} {s}' for s, n in sorted(sources.items()))})")
@@ -0,0 +1,223 @@
+"""Background jobs for slow work, such as insights that have to come from the model.
+
+Jobs live in a SQLite table, so a queued job survives a restart and is picked
+up again by the next process. A job is identified by its kind and a caller
+supplied key: submitting a key that is already queued, running or done
+returns that job instead of adding another. A fixed number of worker threads
+run the jobs; a job that runs past its timeout is cancelled and marked
+failed, and a job left running by a process that died is queued again once
+its lease runs out.
+"""
+import json
+import sqlite3
+import threading
+import time
+
+from utils.inference import run_insight_job
+from utils.metrics import registry
+
+JOBS_DB_FILE = "jobs.db"
+JOB_WORKERS = 2
+JOB_TIMEOUT = 120
+JOB_MAX_ATTEMPTS = 2
+# Finished jobs are kept this long so pollers and resubmissions can see them
+JOB_RESULT_TTL = 24 * 3600
+# How often idle workers look for jobs queued by other processes and expired leases
+JOB_SWEEP_SECONDS = 5
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS jobs ("
+    "key TEXT PRIMARY KEY, kind TEXT NOT NULL, payload TEXT NOT NULL, "
+    "status TEXT NOT NULL, result TEXT, error TEXT, "
+    "attempts INTEGER NOT NULL DEFAULT 0, "
+    "created_at REAL NOT NULL, started_at REAL, finished_at REAL)",
+    "CREATE INDEX IF NOT EXISTS jobs_status_created_at ON jobs (status, created_at)",
+)
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class Job:
+    def __init__(self, key, kind, status, result=None, error=None, attempts=0,
+                 created_at=None, started_at=None, finished_at=None):
+        self.key = key
+        self.kind = kind
+        self.status = status
+        self.result = result
+        self.error = error
+        self.attempts = attempts
+        self.created_at = created_at
+        self.started_at = started_at
+        self.finished_at = finished_at
+
+    @property
+    def pending(self):
+        return self.status in (QUEUED, RUNNING)
+
+    def __repr__(self):
+        return f"Job({self.key!r}, {self.status!r})"
+
+
+class JobQueue:
+    """SQLite-backed job queue with a bounded worker pool, shared by all threads"""
+
+    def __init__(self, path=JOBS_DB_FILE, handlers=None, workers=JOB_WORKERS, timeout=JOB_TIMEOUT,
+                 max_attempts=JOB_MAX_ATTEMPTS, result_ttl=JOB_RESULT_TTL):
+        self.path = path
+        self.handlers = dict(handlers or {})
+        self.workers = workers
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.result_ttl = result_ttl
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._threads = []
+        self._last_sweep = 0.0
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            for statement in SCHEMA:
+                conn.execute(statement)
+            self._local.conn = conn
+        return conn
+
+    def _ensure_workers(self):
+        with self._lock:
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._work, name=f"job-worker-{len(self._threads)}", daemon=True)
+                self._threads.append(thread)
+                thread.start()
+
+    def submit(self, kind, key, payload):
+        """Queue a kind job for key unless one is already queued, running or done; returns the Job"""
+        if kind not in self.handlers:
+            raise ValueError(f"No handler for {kind} jobs")
+        job_key = f"{kind}:{key}"
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT status, finished_at FROM jobs WHERE key = ?", (job_key,)).fetchone()
+            if row is None:
+                conn.execute(
+                    "INSERT INTO jobs (key, kind, payload, status, created_at) VALUES (?, ?, ?, ?, ?)",
+                    (job_key, kind, json.dumps(payload, ensure_ascii=False), QUEUED, now),
+                )
+            elif row["status"] == FAILED or (row["status"] == DONE and now - row["finished_at"] > self.result_ttl):
+                conn.execute(
+                    "UPDATE jobs SET payload = ?, status = ?, result = NULL, error = NULL, attempts = 0, "
+                    "created_at = ?, started_at = NULL, finished_at = NULL WHERE key = ?",
+                    (json.dumps(payload, ensure_ascii=False), QUEUED, now, job_key),
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._ensure_workers()
+        with self._wake:
+            self._wake.notify()
+        return self.get(job_key)
+
+    def get(self, job_key):
+        """The Job stored under job_key, or None"""
+        self._ensure_workers()
+        row = self._connect().execute("SELECT * FROM jobs WHERE key = ?", (job_key,)).fetchone()
+        if row is None:
+            return None
+        return Job(row["key"], row["kind"], row["status"], row["result"], row["error"], row["attempts"],
+                   row["created_at"], row["started_at"], row["finished_at"])
+
+    def _claim(self):
+        now = time.time()
+        # A single statement, so two workers (or processes) never claim the same job;
+        # fetchall steps it to completion, which is what commits it
+        rows = self._connect().execute(
+            "UPDATE jobs SET status = ?, started_at = ?, attempts = attempts + 1 WHERE key = "
+            "(SELECT key FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1) "
+            "RETURNING key, kind, payload, started_at",
+            (RUNNING, now, QUEUED),
+        ).fetchall()
+        return rows[0] if rows else None
+
+    def _finish(self, row, status, result=None, error=None):
+        # Matching started_at leaves alone a job that was requeued after its lease ran out
+        self._connect().execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? "
+            "WHERE key = ? AND status = ? AND started_at = ?",
+            (status, result, error, time.time(), row["key"], RUNNING, row["started_at"]),
+        )
+
+    def _sweep(self):
+        now = time.time()
+        # Leases are generous: a job of a live process is cancelled at timeout long before this
+        lease = now - 2 * self.timeout
+        conn = self._connect()
+        conn.execute(
+            "UPDATE jobs SET status = ?, started_at = NULL WHERE status = ? AND started_at < ? AND attempts < ?",
+            (QUEUED, RUNNING, lease, self.max_attempts),
+        )
+        conn.execute(
+            "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE status = ? AND started_at < ?",
+            (FAILED, "Job was interrupted", now, RUNNING, lease),
+        )
+        conn.execute(
+            "DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?",
+            (DONE, FAILED, now - self.result_ttl),
+        )
+
+    def _run(self, row):
+        handler = self.handlers.get(row["kind"])
+        if handler is None:
+            self._finish(row, FAILED, error=f"No handler for {row['kind']} jobs")
+            return
+        cancel = threading.Event()
+        timer = threading.Timer(self.timeout, cancel.set)
+        timer.daemon = True
+        timer.start()
+        try:
+            result = handler(json.loads(row["payload"]), cancel)
+        except Exception as e:
+            self._finish(row, FAILED, error=str(e) or type(e).__name__)
+            return
+        finally:
+            timer.cancel()
+        if cancel.is_set():
+            self._finish(row, FAILED, error=f"Timed out after {self.timeout} seconds")
+        else:
+            self._finish(row, DONE, result=result)
+
+    def _work(self):
+        while True:
+            try:
+                if time.monotonic() - self._last_sweep > JOB_SWEEP_SECONDS:
+                    self._last_sweep = time.monotonic()
+                    self._sweep()
+                row = self._claim()
+            except sqlite3.Error as e:
+                print(f"Job queue error: {e}")
+                row = None
+            if row is None:
+                with self._wake:
+                    self._wake.wait(JOB_SWEEP_SECONDS)
+                continue
+            try:
+                self._run(row)
+            except sqlite3.Error as e:
+                print(f"Job queue error: {e}")
+
+    def stats(self):
+        rows = self._connect().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        counts.update({status: count for status, count in rows})
+        counts["workers"] = self.workers
+        return counts
+
+
+job_queue = JobQueue(handlers={"insight": run_insight_job})
+registry.register_stats("jobs", job_queue.stats)
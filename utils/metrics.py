@@ -0,0 +1,282 @@
+"""In-process metrics: counters, gauges and latency histograms.
+
+Record calls are cheap and thread-safe; with METRICS_ENABLED=0 in the
+environment they return after a single flag check and timers do not read the
+clock. Components that already keep their own statistics (the caches, the
+inference gate, the job queue) register a stats function instead, which is
+only called when the metrics are exported.
+
+render() produces the Prometheus text format served by Flask's /metrics;
+snapshot() gives the same data as plain values for the admin panel.
+"""
+import bisect
+import contextlib
+import math
+import os
+import threading
+import time
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1").lower() not in ("0", "false", "no", "off")
+
+# Upper bounds in seconds: sub-millisecond model stages up to slow model calls
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_NULL_TIMER = contextlib.nullcontext()
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label(value)}"' for name, value in pairs) + "}"
+
+
+def format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, registry, name, help, labels=()):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def samples(self):
+        """(suffix, label values, extra labels, value) for every exported line"""
+        with self._lock:
+            return [("", key, (), value) for key, value in sorted(self._values.items())]
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        if not self.registry.enabled:
+            return
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class _Timer:
+    __slots__ = ("histogram", "key", "start")
+
+    def __init__(self, histogram, key):
+        self.histogram = histogram
+        self.key = key
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram._observe(self.key, time.perf_counter() - self.start)
+        return False
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, registry, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(registry, name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def _observe(self, key, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # Per-bucket counts (the last one is +Inf), sum, count
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def observe(self, value, **labels):
+        if self.registry.enabled:
+            self._observe(self._key(labels), value)
+
+    def time(self, **labels):
+        """Context manager that observes the seconds spent inside it"""
+        if not self.registry.enabled:
+            return _NULL_TIMER
+        return _Timer(self, self._key(labels))
+
+    def samples(self):
+        lines = []
+        with self._lock:
+            items = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._values.items())
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, math.inf), counts):
+                cumulative += bucket_count
+                lines.append(("_bucket", key, (("le", format_value(bound)),), cumulative))
+            lines.append(("_sum", key, (), total))
+            lines.append(("_count", key, (), count))
+        return lines
+
+    def quantile(self, counts, q):
+        """Estimate of the q quantile from bucket counts, interpolating inside the bucket"""
+        total = sum(counts)
+        if not total:
+            return None
+        rank = q * total
+        cumulative = 0
+        for i, bucket_count in enumerate(counts):
+            if bucket_count and cumulative + bucket_count >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return self.buckets[-1]
+
+    def summary(self, key):
+        with self._lock:
+            counts, total, count = self._values[key]
+            counts = list(counts)
+        return {
+            "count": count,
+            "mean_ms": total / count * 1000,
+            "p50_ms": self.quantile(counts, 0.5) * 1000,
+            "p95_ms": self.quantile(counts, 0.95) * 1000,
+        }
+
+
+class MetricsRegistry:
+    def __init__(self, enabled=METRICS_ENABLED):
+        self.enabled = enabled
+        self._metrics = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _add(self, cls, name, help, labels, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(self, name, help, labels, **kwargs)
+            return metric
+
+    def counter(self, name, help, labels=()):
+        return self._add(Counter, name, help, labels)
+
+    def gauge(self, name, help, labels=()):
+        return self._add(Gauge, name, help, labels)
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram, name, help, labels, buckets=buckets)
+
+    def register_stats(self, prefix, stats):
+        """Export the numbers in stats() as <prefix>_<key> gauges, read at export time"""
+        with self._lock:
+            self._stats[prefix] = stats
+
+    def collect_stats(self):
+        """{prefix: stats dict} from every registered stats function"""
+        with self._lock:
+            sources = list(self._stats.items())
+        collected = {}
+        for prefix, stats in sources:
+            try:
+                collected[prefix] = stats()
+            except Exception as e:
+                print(f"Could not collect {prefix} metrics: {e}")
+        return collected
+
+    def render(self):
+        """Every metric in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for suffix, key, extra, value in metric.samples():
+                lines.append(f"{metric.name}{suffix}{format_labels(metric.label_names, key, extra)} {format_value(value)}")
+        for prefix, stats in self.collect_stats().items():
+            for key, value in stats.items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                name = f"{prefix}_{key}"
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """Plain-value view for display: counters and gauges by label, histogram count/mean/p50/p95"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        snapshot = {}
+        for metric in metrics:
+            with metric._lock:
+                values = dict(metric._values)
+            rows = {}
+            for key in sorted(values):
+                label = ", ".join(f"{name}={value}" for name, value in zip(metric.label_names, key)) or metric.name
+                rows[label] = metric.summary(key) if isinstance(metric, Histogram) else values[key]
+            snapshot[metric.name] = rows
+        return snapshot
+
+    def reset(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric.reset()
+
+
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.histogram(
+    "crop_stage_seconds", "Seconds spent in each stage of serving a recommendation", ("stage",))
+UPSTREAM_SECONDS = registry.histogram(
+    "upstream_request_seconds", "Seconds per outbound HTTP request, retries included; streamed ones until closed",
+    ("host",))
+UPSTREAM_REQUESTS = registry.counter(
+    "upstream_requests_total", "Outbound HTTP requests by final outcome", ("host", "outcome"))
+UPSTREAM_ERRORS = registry.counter(
+    "upstream_errors_total", "Outbound HTTP requests that failed or returned an error status", ("host",))
+UPSTREAM_IN_FLIGHT = registry.gauge(
+    "upstream_in_flight", "Outbound HTTP requests currently waiting for or streaming a response", ("host",))
+
+
+def stage(name):
+    """Time a stage of a recommendation: `with stage("forest"): ...`"""
+    return STAGE_SECONDS.time(stage=name)
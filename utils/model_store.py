@@ -0,0 +1,210 @@
+"""Memory-mappable model artifact.
+
+The forest and the fused scaler are stored as raw .npy arrays next to a small
+JSON manifest. Loading maps the arrays read-only, so a cold start does not
+unpickle anything (or import sklearn) and worker processes share the same
+page-cache pages instead of each holding a private copy of the model.
+"""
+import hashlib
+import json
+import os
+import pickle
+import time
+
+import numpy as np
+
+from utils.forest import FlatForest
+from utils.metrics import stage
+from utils.preprocessing import MINMAX_SCALER_FILE, STANDARD_SCALER_FILE, FusedScaler
+
+MODEL_FILE = "model.pkl"
+# Written by utils.training next to the pickles: label table, metrics, parameters
+MODEL_INFO_FILE = "model_info.json"
+ARTIFACT_DIR = "model_artifact"
+MANIFEST_FILE = "manifest.json"
+FORMAT_NAME = "crop-recommendation-model"
+FORMAT_VERSION = 1
+
+FOREST_ARRAYS = ("feature", "threshold", "children", "value", "roots", "classes")
+SCALER_ARRAYS = ("scale", "offset")
+
+
+def source_fingerprint(paths):
+    fingerprint = {}
+    for path in paths:
+        stat = os.stat(path)
+        fingerprint[os.path.basename(path)] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    return fingerprint
+
+
+def read_model_labels(path=MODEL_INFO_FILE):
+    """{crop id: name} from a training info file, or None when there is none"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            labels = json.load(f)["labels"]
+    except FileNotFoundError:
+        return None
+    return {int(crop_id): name for crop_id, name in labels.items()}
+
+
+def export_artifact(forest, scaler, path=ARTIFACT_DIR, sources=None, labels=None, compaction=None):
+    """Write forest and scaler arrays plus a manifest; the manifest is swapped in last"""
+    os.makedirs(path, exist_ok=True)
+    arrays = {
+        "feature": forest.feature,
+        "threshold": forest.threshold,
+        "children": forest.children,
+        "value": forest.value,
+        "roots": forest.roots,
+        "classes": forest.classes_,
+        "scale": scaler.scale_,
+        "offset": scaler.offset_,
+    }
+
+    # Array files carry a content token, so readers of the previous manifest
+    # keep a consistent set of files while a new export is being written
+    digest = hashlib.sha256()
+    for name in FOREST_ARRAYS + SCALER_ARRAYS:
+        digest.update(np.ascontiguousarray(arrays[name]).tobytes())
+    token = digest.hexdigest()[:12]
+
+    entries = {}
+    for name, array in arrays.items():
+        filename = f"{name}.{token}.npy"
+        target = os.path.join(path, filename)
+        # Never write over a token file in place: another worker exporting the same
+        # model may already have it memory-mapped, and truncating it would SIGBUS that
+        # worker. A file under this name is complete, because it only appears by rename.
+        if not os.path.exists(target):
+            tmp_path = f"{target}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                np.save(f, np.ascontiguousarray(array), allow_pickle=False)
+            os.replace(tmp_path, target)
+        entries[name] = {"file": filename, "dtype": str(array.dtype), "shape": list(array.shape)}
+
+    manifest = {
+        "format": FORMAT_NAME,
+        "version": FORMAT_VERSION,
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "n_features": int(scaler.n_features_in_),
+        "n_estimators": int(forest.n_estimators),
+        "node_count": int(forest.node_count),
+        "max_depth": int(forest.max_depth),
+        "sources": sources or {},
+        "labels": {str(crop_id): name for crop_id, name in labels.items()} if labels else None,
+        "compaction": compaction,
+        "arrays": entries,
+    }
+    tmp_path = os.path.join(path, f"{MANIFEST_FILE}.{os.getpid()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(path, MANIFEST_FILE))
+
+    referenced = {entry["file"] for entry in entries.values()} | {MANIFEST_FILE}
+    for filename in os.listdir(path):
+        if filename.endswith(".npy") and filename not in referenced:
+            try:
+                os.remove(os.path.join(path, filename))
+            except OSError:
+                pass
+    return manifest
+
+
+def read_manifest(path=ARTIFACT_DIR):
+    with open(os.path.join(path, MANIFEST_FILE), "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format") != FORMAT_NAME:
+        raise ValueError(f"{path} is not a {FORMAT_NAME} artifact")
+    if manifest.get("version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported artifact version {manifest.get('version')}, expected {FORMAT_VERSION}")
+    return manifest
+
+
+def artifact_labels(path=ARTIFACT_DIR):
+    """{crop id: name} embedded in the manifest, or None for models trained before the label table"""
+    labels = read_manifest(path).get("labels")
+    return {int(crop_id): name for crop_id, name in labels.items()} if labels else None
+
+
+def load_artifact(path=ARTIFACT_DIR, mmap=True):
+    with stage("artifact_load"):
+        return _load_artifact(path, mmap)
+
+
+def _load_artifact(path, mmap):
+    manifest = read_manifest(path)
+    arrays = {}
+    for name, entry in manifest["arrays"].items():
+        array = np.load(os.path.join(path, entry["file"]), mmap_mode="r" if mmap else None, allow_pickle=False)
+        if str(array.dtype) != entry["dtype"] or list(array.shape) != entry["shape"]:
+            raise ValueError(f"Array {name} does not match the manifest")
+        arrays[name] = array
+
+    forest = FlatForest(
+        arrays["feature"], arrays["threshold"], arrays["children"], arrays["value"],
+        arrays["roots"], arrays["classes"], manifest["max_depth"],
+    )
+    scaler = FusedScaler(arrays["scale"], arrays["offset"])
+    return forest, scaler
+
+
+def load_pickles(model_path=MODEL_FILE, minmax_path=MINMAX_SCALER_FILE, standard_path=STANDARD_SCALER_FILE):
+    with stage("unpickle"):
+        with open(model_path, "rb") as f:
+            model = pickle.load(f)
+        with open(minmax_path, "rb") as f:
+            ms = pickle.load(f)
+        with open(standard_path, "rb") as f:
+            sc = pickle.load(f)
+    return FlatForest.from_sklearn(model), FusedScaler.from_scalers(ms, sc)
+
+
+def source_paths(model_path=MODEL_FILE, minmax_path=MINMAX_SCALER_FILE,
+                 standard_path=STANDARD_SCALER_FILE, info_path=MODEL_INFO_FILE):
+    paths = [model_path, minmax_path, standard_path]
+    if os.path.exists(info_path):
+        paths.append(info_path)
+    return paths
+
+
+def load_cached_artifact(path=ARTIFACT_DIR, model_path=MODEL_FILE, minmax_path=MINMAX_SCALER_FILE,
+                         standard_path=STANDARD_SCALER_FILE, info_path=MODEL_INFO_FILE):
+    """Map the artifact, rebuilding it from the pickles when missing or out of date"""
+    sources = source_fingerprint(source_paths(model_path, minmax_path, standard_path, info_path))
+    try:
+        if read_manifest(path).get("sources") == sources:
+            return load_artifact(path)
+    except (OSError, ValueError, KeyError):
+        pass
+
+    forest, scaler = load_pickles(model_path, minmax_path, standard_path)
+    try:
+        export_artifact(forest, scaler, path, sources, read_model_labels(info_path))
+        return load_artifact(path)
+    except OSError as e:
+        print(f"Could not write model artifact to {path} (using pickled models): {e}")
+        return forest, scaler
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export or inspect the memory-mappable model artifact")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export_parser = subparsers.add_parser("export", help="convert the pickled model and scalers")
+    export_parser.add_argument("--model", default=MODEL_FILE)
+    export_parser.add_argument("--minmax", default=MINMAX_SCALER_FILE)
+    export_parser.add_argument("--standard", default=STANDARD_SCALER_FILE)
+    export_parser.add_argument("--info", default=MODEL_INFO_FILE)
+    export_parser.add_argument("--out", default=ARTIFACT_DIR)
+    info_parser = subparsers.add_parser("info", help="print an artifact manifest")
+    info_parser.add_argument("--path", default=ARTIFACT_DIR)
+    args = parser.parse_args()
+
+    if args.command == "export":
+        forest, scaler = load_pickles(args.model, args.minmax, args.standard)
+        sources = source_fingerprint(source_paths(args.model, args.minmax, args.standard, args.info))
+        manifest = export_artifact(forest, scaler, args.out, sources, read_model_labels(args.info))
+        print(f"Wrote {args.out}: {manifest['n_estimators']} trees, {manifest['node_count']} nodes")
+    else:
+        print(json.dumps(read_manifest(args.path), indent=2))
@@ -0,0 +1,165 @@
+"""Memoized class probabilities for single field readings.
+
+Readings arrive at the precision of the input forms (N, P and K as whole
+numbers, the other features to one decimal), so the same feature vectors come
+up again and again. A reading on that grid is keyed by its quantized tuple, and
+a repeat lookup returns the stored probability row without running the
+scalers or the forest. Readings with more precision than the grid (from the
+API or a CSV) are not rounded: they skip the cache and are predicted as given.
+
+Besides the bounded LRU, a list of frequent readings can be precomputed in
+one batched pass. Those entries are pinned and never evicted. Build the list
+from any CSV of past readings:
+
+    python -m utils.prediction_cache readings.csv --top 2000
+"""
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+PREDICTION_CACHE_SIZE = 4096
+# Decimal places of each feature (N, P, K, temperature, humidity, ph, rainfall) in the input forms
+FEATURE_DECIMALS = (0, 0, 0, 1, 1, 1, 1)
+# Readings precomputed at startup when this file exists (a CSV with the feature columns)
+FREQUENT_INPUTS_FILE = "frequent_inputs.csv"
+FREQUENT_INPUTS_TOP = 2000
+
+
+class PredictionCache:
+    """LRU of probability rows by quantized reading, shared by all sessions and threads"""
+
+    def __init__(self, predict_proba, max_entries=PREDICTION_CACHE_SIZE, decimals=FEATURE_DECIMALS):
+        self.predict_proba = predict_proba
+        self.max_entries = max_entries
+        self.scale = np.power(10.0, decimals)
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self._entries = OrderedDict()
+        self._pinned = {}
+        self._lock = threading.Lock()
+
+    def key(self, row):
+        """Quantized tuple for a reading on the input grid, or None for a more precise one"""
+        steps = row * self.scale
+        rounded = np.round(steps)
+        if np.abs(steps - rounded).max() > 1e-6:
+            return None
+        return tuple(int(step) for step in rounded)
+
+    def _compute(self, keys):
+        # The grid value of each key, so a key always maps to the same probabilities
+        proba = self.predict_proba(np.asarray(keys, dtype=np.float64) / self.scale)
+        proba.flags.writeable = False
+        return proba
+
+    def proba(self, row):
+        """Probability row for one validated reading; callers must not modify it"""
+        key = self.key(row)
+        if key is None:
+            with self._lock:
+                self.bypassed += 1
+            return self.predict_proba(row.reshape(1, -1))[0]
+
+        with self._lock:
+            proba = self._pinned.get(key)
+            if proba is None:
+                proba = self._entries.get(key)
+                if proba is not None:
+                    self._entries.move_to_end(key)
+            if proba is not None:
+                self.hits += 1
+                return proba
+            self.misses += 1
+
+        # Computed outside the lock; two sessions missing on the same key both store the same row
+        proba = self._compute([key])[0]
+        with self._lock:
+            self._entries[key] = proba
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return proba
+
+    def precompute(self, rows):
+        """Pin the probabilities of every on-grid reading in rows; returns how many were added"""
+        keys = list(dict.fromkeys(key for key in map(self.key, np.asarray(rows, dtype=np.float64))
+                                  if key is not None))
+        if not keys:
+            return 0
+        pinned = dict(zip(keys, self._compute(keys)))
+        with self._lock:
+            self._pinned.update(pinned)
+            for key in pinned:
+                self._entries.pop(key, None)
+        return len(pinned)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._pinned.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self._entries),
+                "pinned": len(self._pinned),
+            }
+
+
+def read_readings(path):
+    import pandas as pd
+
+    from utils.predictor import FEATURE_NAMES
+
+    frame = pd.read_csv(path)
+    missing = [name for name in FEATURE_NAMES if name not in frame.columns]
+    if missing:
+        raise ValueError(f"{path} is missing columns: {', '.join(missing)}")
+    return frame[list(FEATURE_NAMES)].dropna().to_numpy(dtype=float)
+
+
+def load_frequent_inputs(cache, path=FREQUENT_INPUTS_FILE):
+    """Precompute the readings listed in path, if it exists"""
+    if not os.path.exists(path):
+        return 0
+    try:
+        return cache.precompute(read_readings(path))
+    except (OSError, ValueError) as e:
+        print(f"Could not precompute {path}: {e}")
+        return 0
+
+
+def frequent_readings(rows, top=FREQUENT_INPUTS_TOP, decimals=FEATURE_DECIMALS):
+    """The top most common readings in rows after rounding to the input grid, most common first"""
+    rounded = np.round(np.asarray(rows, dtype=np.float64) * np.power(10.0, decimals))
+    unique, counts = np.unique(rounded, axis=0, return_counts=True)
+    order = np.argsort(-counts, kind="stable")[:top]
+    return unique[order] / np.power(10.0, decimals), counts[order]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    import pandas as pd
+
+    from utils.predictor import FEATURE_NAMES
+
+    parser = argparse.ArgumentParser(description="List the most frequent readings to precompute at startup")
+    parser.add_argument("readings", help="CSV of past readings with the feature columns")
+    parser.add_argument("--top", type=int, default=FREQUENT_INPUTS_TOP)
+    parser.add_argument("--out", default=FREQUENT_INPUTS_FILE)
+    args = parser.parse_args()
+
+    rows = read_readings(args.readings)
+    readings, counts = frequent_readings(rows, args.top)
+    pd.DataFrame(readings, columns=list(FEATURE_NAMES)).to_csv(args.out, index=False)
+    print(f"Wrote {len(readings)} readings to {args.out}, covering {counts.sum() / max(len(rows), 1):.0%} "
+          f"of {len(rows)} rows")
@@ -0,0 +1,129 @@
+import threading
+
+import numpy as np
+
+from utils.metrics import registry, stage
+from utils.model_store import ARTIFACT_DIR, artifact_labels, load_cached_artifact
+from utils.prediction_cache import PredictionCache, load_frequent_inputs
+
+FEATURE_NAMES = ("N", "P", "K", "temperature", "humidity", "ph", "rainfall")
+
+# Class ids used when model.pkl was trained (see the notebook); models built by
+# utils.training keep these ids and carry their own table in the artifact. There is no
+# Grapes class: the 22-entry tables the Streamlit apps used were off by one
+# from Mango onwards.
+CROP_LABELS = {
+    1: "Rice", 2: "Maize", 3: "Jute", 4: "Cotton", 5: "Coconut", 6: "Papaya", 7: "Orange",
+    8: "Apple", 9: "Muskmelon", 10: "Watermelon", 11: "Mango", 12: "Banana",
+    13: "Pomegranate", 14: "Lentil", 15: "Blackgram", 16: "Mungbean", 17: "Mothbeans",
+    18: "Pigeonpeas", 19: "Kidneybeans", 20: "Chickpea", 21: "Coffee"
+}
+
+
+class CropPredictor:
+    """Fused scaler + forest + label table behind one batched interface.
+
+    Instances hold only read-only arrays and every call allocates its own
+    buffers, so one predictor can serve concurrent requests from any thread.
+    Single readings from the forms go through predict_one/recommend_one, which
+    memoize the probabilities of repeated readings.
+    """
+
+    def __init__(self, model, scaler, labels=None):
+        self.model = model
+        self.scaler = scaler
+        self.labels = dict(CROP_LABELS if labels is None else labels)
+        self.classes_ = model.classes_
+        self.class_labels = [self.labels.get(int(c)) for c in self.classes_]
+        self.cache = PredictionCache(self.predict_proba)
+
+    @classmethod
+    def load(cls, artifact_dir=ARTIFACT_DIR):
+        model, scaler = load_cached_artifact(artifact_dir)
+        try:
+            labels = artifact_labels(artifact_dir)
+        except (OSError, ValueError):
+            labels = None
+        return cls(model, scaler, labels)
+
+    def features_matrix(self, features):
+        X = np.asarray(features, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.ndim != 2 or X.shape[1] != len(FEATURE_NAMES):
+            raise ValueError(f"Each row must have {len(FEATURE_NAMES)} features: {', '.join(FEATURE_NAMES)}")
+        if not np.isfinite(X).all():
+            raise ValueError("Features must be finite numbers")
+        return X
+
+    def predict_proba(self, features):
+        X = self.features_matrix(features)
+        with stage("scale"):
+            X = self.scaler.transform(X)
+        with stage("forest"):
+            return self.model.predict_proba(X)
+
+    def predict_with_proba(self, features):
+        """Class ids and class probabilities from a single forest pass"""
+        proba = self.predict_proba(features)
+        return self.classes_.take(np.argmax(proba, axis=1)), proba
+
+    def predict(self, features):
+        return self.predict_with_proba(features)[0]
+
+    def predict_one(self, features):
+        """Crop name for a single reading, memoized"""
+        proba = self.cache.proba(self.features_matrix(features)[0])
+        return self.class_labels[int(np.argmax(proba))]
+
+    def recommend_one(self, features, k=3):
+        """Top-k crops for a single reading, memoized"""
+        return self.rank(self.cache.proba(self.features_matrix(features)[0])[None, :], k)[0]
+
+    def recommend(self, features, k=3):
+        """Top-k crops per row, best first, ranked from a single predict_proba pass"""
+        return self.rank(self.predict_proba(features), k)
+
+    def rank(self, proba, k=3):
+        """Top-k crops for every row of an already computed probability matrix"""
+        k = max(1, min(int(k), proba.shape[1]))
+        top = np.argpartition(-proba, k - 1, axis=1)[:, :k]
+        top_proba = np.take_along_axis(proba, top, axis=1)
+        # Highest probability first; ties keep class order, as argmax does in predict
+        order = np.lexsort((top, -top_proba), axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+
+        recommendations = []
+        for row, columns in zip(proba, top):
+            recommendations.append([
+                {
+                    "crop_id": int(self.classes_[j]),
+                    "crop": self.class_labels[j],
+                    "probability": float(row[j]),
+                }
+                for j in columns
+            ])
+        return recommendations
+
+    def label(self, class_id):
+        return self.labels.get(int(class_id))
+
+    def predict_labels(self, features):
+        return [self.label(c) for c in self.predict(features)]
+
+
+_predictor = None
+_predictor_lock = threading.Lock()
+
+
+def get_predictor():
+    """Process-wide predictor, loaded on first use"""
+    global _predictor
+    if _predictor is None:
+        with _predictor_lock:
+            if _predictor is None:
+                predictor = CropPredictor.load()
+                load_frequent_inputs(predictor.cache)
+                registry.register_stats("prediction_cache", predictor.cache.stats)
+                _predictor = predictor
+    return _predictor
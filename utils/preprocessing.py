@@ -0,0 +1,46 @@
+import pickle
+from functools import lru_cache
+
+import numpy as np
+
+MINMAX_SCALER_FILE = "minmaxscaler.pkl"
+STANDARD_SCALER_FILE = "standscaler.pkl"
+
+
+class FusedScaler:
+    """MinMaxScaler followed by StandardScaler, folded into one x * scale + offset"""
+
+    def __init__(self, scale, offset):
+        self.scale_ = np.ascontiguousarray(scale, dtype=np.float64)
+        self.offset_ = np.ascontiguousarray(offset, dtype=np.float64)
+        self.n_features_in_ = len(self.scale_)
+
+    @classmethod
+    def from_scalers(cls, ms, sc):
+        if getattr(ms, "clip", False):
+            raise ValueError("A clipping MinMaxScaler cannot be folded into an affine transform")
+
+        # MinMaxScaler: x * ms.scale_ + ms.min_
+        # StandardScaler: (x - sc.mean_) / sc.scale_
+        mean = sc.mean_ if sc.with_mean else np.zeros(ms.n_features_in_)
+        std = sc.scale_ if sc.with_std else np.ones(ms.n_features_in_)
+        return cls(ms.scale_ / std, (ms.min_ - mean) / std)
+
+    def transform(self, X, out=None):
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Expected {self.n_features_in_} features, got {X.shape[1]}")
+        out = np.multiply(X, self.scale_, out=out)
+        out += self.offset_
+        return out
+
+
+@lru_cache(maxsize=None)
+def load_scaler(minmax_path=MINMAX_SCALER_FILE, standard_path=STANDARD_SCALER_FILE):
+    with open(minmax_path, "rb") as f:
+        ms = pickle.load(f)
+    with open(standard_path, "rb") as f:
+        sc = pickle.load(f)
+    return FusedScaler.from_scalers(ms, sc)
@@ -0,0 +1,222 @@
+"""Train the crop model and its scalers from Crop_recommendation.csv.
+
+Reproduces the notebook pipeline (MinMaxScaler, then StandardScaler, then a
+RandomForestClassifier) as a script. Hyperparameters are picked by a
+cross-validated grid search that runs candidates and folds in parallel
+worker processes (n_jobs=-1 uses every core). Each run writes a new version
+directory with the three pickles and model_info.json: the label table, the
+chosen parameters, cross-validation and test metrics, and timings.
+
+    python -m utils.training                 # writes models/v<N>/
+    python -m utils.training --install       # ...and copies it over the served model
+
+Crop ids follow the notebook's crop_dict, so a retrained model keeps the ids
+of the current one; labels not in that table get the next free ids.
+"""
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import time
+
+import numpy as np
+
+from utils.model_store import MODEL_FILE, MODEL_INFO_FILE
+from utils.predictor import CROP_LABELS, FEATURE_NAMES
+from utils.preprocessing import MINMAX_SCALER_FILE, STANDARD_SCALER_FILE
+
+DATASET_FILE = "Crop_recommendation.csv"
+MODELS_DIR = "models"
+FORMAT_NAME = "crop-model-info"
+FORMAT_VERSION = 1
+
+TEST_SIZE = 0.2
+CV_FOLDS = 5
+RANDOM_STATE = 42
+
+PARAM_GRID = {
+    "forest__n_estimators": [100, 200],
+    "forest__max_depth": [None, 12],
+    "forest__min_samples_leaf": [1, 2],
+    "forest__max_features": ["sqrt", 0.5],
+}
+QUICK_PARAM_GRID = {
+    "forest__n_estimators": [50, 100],
+    "forest__max_depth": [None],
+}
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def label_table(names):
+    """{crop id: display name} covering names, keeping the ids of CROP_LABELS"""
+    known = {label.casefold(): crop_id for crop_id, label in CROP_LABELS.items()}
+    table = {}
+    next_id = max(CROP_LABELS) + 1
+    for name in sorted(set(names), key=lambda name: (name.casefold() not in known, name.casefold())):
+        crop_id = known.get(name.casefold())
+        if crop_id is None:
+            crop_id, next_id = next_id, next_id + 1
+        table[crop_id] = CROP_LABELS.get(crop_id, name.strip().capitalize())
+    return dict(sorted(table.items()))
+
+
+def load_training_data(path=DATASET_FILE):
+    import pandas as pd
+
+    frame = pd.read_csv(path)
+    missing = [name for name in (*FEATURE_NAMES, "label") if name not in frame.columns]
+    if missing:
+        raise ValueError(f"{path} is missing columns: {', '.join(missing)}")
+    frame = frame.dropna(subset=[*FEATURE_NAMES, "label"])
+    labels = label_table(frame["label"])
+    ids = {name.casefold(): crop_id for crop_id, name in labels.items()}
+    X = frame[list(FEATURE_NAMES)].to_numpy(dtype=float)
+    y = frame["label"].map(lambda name: ids[name.casefold()]).to_numpy()
+    return X, y, labels
+
+
+def split_dataset(X, y, test_size=TEST_SIZE, random_state=RANDOM_STATE):
+    """Stratified (X_train, X_test, y_train, y_test); an int test_size is a row count"""
+    from sklearn.model_selection import train_test_split
+
+    return train_test_split(X, y, test_size=test_size, random_state=random_state, stratify=y)
+
+
+def next_version(models_dir=MODELS_DIR):
+    versions = [int(name[1:]) for name in os.listdir(models_dir)
+                if name.startswith("v") and name[1:].isdigit()] if os.path.isdir(models_dir) else []
+    return f"v{max(versions, default=0) + 1}"
+
+
+def train(dataset=DATASET_FILE, models_dir=MODELS_DIR, param_grid=None, cv=CV_FOLDS, n_jobs=-1,
+          test_size=TEST_SIZE, random_state=RANDOM_STATE):
+    """Search, fit and write one model version; returns (version directory, model info)"""
+    import sklearn
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.metrics import accuracy_score, classification_report, f1_score
+    from sklearn.model_selection import GridSearchCV, StratifiedKFold
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import MinMaxScaler, StandardScaler
+
+    started = time.perf_counter()
+    X, y, labels = load_training_data(dataset)
+    X_train, X_test, y_train, y_test = split_dataset(X, y, test_size, random_state)
+
+    # Scalers sit inside the pipeline so each fold fits them on its own training rows
+    pipeline = Pipeline([
+        ("minmax", MinMaxScaler()),
+        ("standard", StandardScaler()),
+        ("forest", RandomForestClassifier(random_state=random_state, n_jobs=1)),
+    ])
+    # Each candidate and fold is one task for the process pool; the forests stay single-threaded
+    search = GridSearchCV(
+        pipeline,
+        param_grid or PARAM_GRID,
+        cv=StratifiedKFold(cv, shuffle=True, random_state=random_state),
+        scoring="accuracy",
+        n_jobs=n_jobs,
+    )
+    search_started = time.perf_counter()
+    search.fit(X_train, y_train)
+    search_seconds = time.perf_counter() - search_started
+
+    best = search.best_estimator_
+    predicted = best.predict(X_test)
+    names = [labels[crop_id] for crop_id in best.classes_]
+    report = classification_report(y_test, predicted, labels=best.classes_, target_names=names,
+                                   output_dict=True, zero_division=0)
+    best_index = search.best_index_
+    total_seconds = time.perf_counter() - started
+
+    version = next_version(models_dir)
+    out = os.path.join(models_dir, version)
+    os.makedirs(out)
+    for filename, step in ((MODEL_FILE, "forest"), (MINMAX_SCALER_FILE, "minmax"),
+                           (STANDARD_SCALER_FILE, "standard")):
+        with open(os.path.join(out, filename), "wb") as f:
+            pickle.dump(best.named_steps[step], f)
+
+    info = {
+        "format": FORMAT_NAME,
+        "version": FORMAT_VERSION,
+        "model_version": version,
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "dataset": {
+            "file": os.path.basename(dataset),
+            "sha256": file_sha256(dataset),
+            "rows": int(len(y)),
+            "train_rows": int(len(y_train)),
+            "test_rows": int(len(y_test)),
+        },
+        "features": list(FEATURE_NAMES),
+        "labels": {str(crop_id): name for crop_id, name in labels.items()},
+        "params": {key.split("__", 1)[1]: value for key, value in search.best_params_.items()},
+        "metrics": {
+            "cv_accuracy_mean": float(search.cv_results_["mean_test_score"][best_index]),
+            "cv_accuracy_std": float(search.cv_results_["std_test_score"][best_index]),
+            "test_accuracy": float(accuracy_score(y_test, predicted)),
+            "test_macro_f1": float(f1_score(y_test, predicted, average="macro")),
+            "per_class_f1": {name: round(report[name]["f1-score"], 4) for name in names},
+        },
+        "training": {
+            "candidates": len(search.cv_results_["params"]),
+            "cv_folds": cv,
+            "n_jobs": n_jobs,
+            "cpu_count": os.cpu_count(),
+            "search_seconds": round(search_seconds, 3),
+            "refit_seconds": round(search.refit_time_, 3),
+            "total_seconds": round(total_seconds, 3),
+            "random_state": random_state,
+            "sklearn": sklearn.__version__,
+            "numpy": np.__version__,
+        },
+    }
+    with open(os.path.join(out, MODEL_INFO_FILE), "w", encoding="utf-8") as f:
+        json.dump(info, f, indent=2)
+    return out, info
+
+
+def install(version_dir, target_dir="."):
+    """Copy a trained version over the served model files; the model artifact rebuilds on next start"""
+    for filename in (MINMAX_SCALER_FILE, STANDARD_SCALER_FILE, MODEL_INFO_FILE, MODEL_FILE):
+        target = os.path.join(target_dir, filename)
+        tmp_path = f"{target}.{os.getpid()}.tmp"
+        shutil.copyfile(os.path.join(version_dir, filename), tmp_path)
+        os.replace(tmp_path, target)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Train the crop recommendation model and scalers")
+    parser.add_argument("--data", default=DATASET_FILE, help="training CSV with the feature columns and label")
+    parser.add_argument("--out", default=MODELS_DIR, help="directory that receives the new version")
+    parser.add_argument("--cv", type=int, default=CV_FOLDS, help="cross-validation folds")
+    parser.add_argument("--jobs", type=int, default=-1, help="worker processes for the search (-1: all cores)")
+    parser.add_argument("--test-size", type=float, default=TEST_SIZE)
+    parser.add_argument("--seed", type=int, default=RANDOM_STATE)
+    parser.add_argument("--quick", action="store_true", help="search a small grid")
+    parser.add_argument("--install", action="store_true", help="serve the new model from the repository root")
+    args = parser.parse_args()
+
+    out, info = train(args.data, args.out, QUICK_PARAM_GRID if args.quick else PARAM_GRID,
+                      args.cv, args.jobs, args.test_size, args.seed)
+    metrics, training = info["metrics"], info["training"]
+    print(f"{info['model_version']}: {info['dataset']['rows']} rows, {len(info['labels'])} crops")
+    print(f"best params {info['params']}")
+    print(f"cv accuracy {metrics['cv_accuracy_mean']:.4f} ± {metrics['cv_accuracy_std']:.4f}, "
+          f"test accuracy {metrics['test_accuracy']:.4f}, macro F1 {metrics['test_macro_f1']:.4f}")
+    print(f"{training['candidates']} candidates x {training['cv_folds']} folds in {training['search_seconds']:.1f}s "
+          f"on {training['cpu_count']} cores, {training['total_seconds']:.1f}s total")
+    print(f"Wrote {out}")
+    if args.install:
+        install(out)
+        print(f"Installed {out} as the served model")
@@ -1,73 +1,65 @@
-translations = {
-    "en": {
-        "app_title": "🌱 Smart Crop Recommendation System",
-        "welcome": "Welcome! Get intelligent crop recommendations based on your soil and environmental conditions.",
-        "login": "Login",
-        "signup": "Sign Up",
-        "logout": "Logout",
-        "email": "Email",
-        "password": "Password",
-        "home": "Home",
-        "weather": "Weather Forecast",
-        "forums": "Community Forums",
-        "ai_chat": "AI Assistant",
-        "nitrogen": "Nitrogen level (N)",
-        "phosphorus": "Phosphorus level (P)",
-        "potassium": "Potassium level (K)",
-        "temperature": "Temperature (°C)",
-        "humidity": "Humidity (%)",
-        "ph": "pH value",
-        "rainfall": "Rainfall (mm)",
-        "get_recommendation": "Get Crop Recommendation",
-        "recommended_crop": "Recommended Crop",
-        "crop_insights": "Agricultural Insights",
-        "ask_question": "Ask a question about crop cultivation",
-        "weather_location": "Enter your city name",
-        "get_weather": "Get Weather Forecast",
-        "current_weather": "Current Weather",
-        "forum_title": "Community Discussion Forum",
-        "forum_desc": "Share your farming experiences and learn from other farmers",
-        "your_name": "Your Name",
-        "discussion_topic": "Discussion Topic",
-        "your_message": "Your Message",
-        "post_message": "Post Message",
-        "recent_discussions": "Recent Discussions"
-    },
-    "te": {
-        "app_title": "🌱 స్మార్ట్ పంట సిఫార్సు వ్యవస్థ",
-        "welcome": "స్వాగతం! మీ నేల మరియు పర్యావరణ పరిస్థితుల ఆధారంగా తెలివైన పంట సిఫార్సులను పొందండి.",
-        "login": "లాగిన్",
-        "signup": "సైన్ అప్",
-        "logout": "లాగౌట్",
-        "email": "ఇమెయిల్",
-        "password": "పాస్‌వర్డ్",
-        "home": "హోమ్",
-        "weather": "వాతావరణ సూచన",
-        "forums": "సమాజ వేదికలు",
-        "ai_chat": "AI సహాయకుడు",
-        "nitrogen": "నత్రజని స్థాయి (N)",
-        "phosphorus": "భాస్వరం స్థాయి (P)",
-        "potassium": "పొటాషియం స్థాయి (K)",
-        "temperature": "ఉష్ణోగ్రత (°C)",
-        "humidity": "తేమ (%)",
-        "ph": "pH విలువ",
-        "rainfall": "వర్షపాతం (mm)",
-        "get_recommendation": "పంట సిఫార్సు పొందండి",
-        "recommended_crop": "సిఫార్సు చేయబడిన పంట",
-        "crop_insights": "వ్యవసాయ అంతర్దృష్టులు",
-        "ask_question": "పంట సాగు గురించి ప్రశ్న అడగండి",
-        "weather_location": "మీ నగరం పేరు నమోదు చేయండి",
-        "get_weather": "వాతావరణ సూచన పొందండి",
-        "current_weather": "ప్రస్తుత వాతావరణం",
-        "forum_title": "సమాజ చర్చా వేదిక",
-        "forum_desc": "మీ వ్యవసాయ అనుభవాలను పంచుకోండి మరియు ఇతర రైతుల నుండి నేర్చుకోండి",
-        "your_name": "మీ పేరు",
-        "discussion_topic": "చర్చా అంశం",
-        "your_message": "మీ సందేశం",
-        "post_message": "సందేశం పోస్ట్ చేయండి",
-        "recent_discussions": "ఇటీవలి చర్చలు"
-    }
-}
+"""UI strings, one JSON catalog per language in utils/locales.
+
+A catalog is read the first time its language is used and merged over the
+English catalog, so every key resolves with a single dict lookup and a
+missing translation shows the English text. Keys a catalog lacks (or has
+that English does not) are reported once, when it loads.
+"""
+import json
+import os
+import threading
+from types import MappingProxyType
+
+LOCALES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "locales")
+DEFAULT_LANGUAGE = "en"
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+def available_languages():
+    """Language codes with a catalog, English first"""
+    codes = sorted(name[:-5] for name in os.listdir(LOCALES_DIR) if name.endswith(".json"))
+    return sorted(codes, key=lambda code: code != DEFAULT_LANGUAGE)
+
+def _read_catalog(lang):
+    with open(os.path.join(LOCALES_DIR, f"{lang}.json"), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def _load_catalog(lang):
+    with _catalogs_lock:
+        if lang in _catalogs:
+            return _catalogs[lang]
+
+        english = _catalogs.get(DEFAULT_LANGUAGE)
+        if english is None:
+            english = _catalogs[DEFAULT_LANGUAGE] = MappingProxyType(_read_catalog(DEFAULT_LANGUAGE))
+        if lang == DEFAULT_LANGUAGE:
+            return english
+
+        try:
+            if not str(lang).replace("-", "").replace("_", "").isalnum():
+                raise ValueError("invalid language code")
+            strings = _read_catalog(lang)
+        except (OSError, ValueError) as e:
+            print(f"Translation catalog '{lang}' unavailable, using English: {e}")
+            catalog = english
+        else:
+            missing = sorted(english.keys() - strings.keys())
+            unknown = sorted(strings.keys() - english.keys())
+            if missing:
+                print(f"Translation catalog '{lang}' is missing {len(missing)} keys (English used): {', '.join(missing)}")
+            if unknown:
+                print(f"Translation catalog '{lang}' has keys English does not: {', '.join(unknown)}")
+            catalog = MappingProxyType({**english, **strings})
+        _catalogs[lang] = catalog
+        return catalog
+
+def get_catalog(lang):
+    """Read-only mapping of every UI key to its text in lang"""
+    catalog = _catalogs.get(lang)
+    if catalog is None:
+        catalog = _load_catalog(lang)
+    return catalog
 
 def get_text(lang, key):
-    return translations.get(lang, translations["en"]).get(key, key)
+    return get_catalog(lang).get(key, key)
@@ -1,7 +1,110 @@
-import requests
 import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from utils.http_client import http_client
+from utils.metrics import registry, stage
+
+# Seconds a caller waits for all of its weather calls together
+WEATHER_DEADLINE = 8
+# Upper bound on OpenWeather calls in flight from this process
+MAX_CONCURRENT_REQUESTS = 8
+
+# Current conditions change on a ~10 minute scale, the forecast every 3 hours
+CURRENT_WEATHER_TTL = 600
+FORECAST_TTL = 1800
+# How long past its TTL an entry is still served while a refresh runs in the background
+STALE_WHILE_REVALIDATE = 3600
+WEATHER_CACHE_SIZE = 256
+
+_executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_REQUESTS, thread_name_prefix="weather")
+
+def normalize_city(city):
+    return " ".join(str(city).split()).casefold()
+
+class WeatherCache:
+    """LRU cache of successful weather lookups with stale-while-revalidate"""
+
+    def __init__(self, max_entries=WEATHER_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def _store(self, key, result):
+        with self._lock:
+            self._entries[key] = (result, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _refresh(self, key, fetch):
+        try:
+            result = fetch()
+            if result[0] is not None:
+                self._store(key, result)
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def get(self, key, ttl, fetch):
+        """Cached (data, error) for key, calling fetch() only on a miss or in the background"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                age = time.monotonic() - entry[1]
+                if age < ttl:
+                    self.hits += 1
+                    return entry[0]
+                if age < ttl + STALE_WHILE_REVALIDATE:
+                    self.stale_hits += 1
+                    if key not in self._refreshing:
+                        self._refreshing.add(key)
+                        _executor.submit(self._refresh, key, fetch)
+                    return entry[0]
+            self.misses += 1
+
+        result = fetch()
+        if result[0] is not None:
+            self._store(key, result)
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+                "size": len(self._entries),
+            }
+
+weather_cache = WeatherCache()
+registry.register_stats("weather_cache", weather_cache.stats)
+
+def timed_fetch(name, fetch, city):
+    with stage(name):
+        return fetch(city)
 
 def get_weather_forecast(city):
+    key = ("current", normalize_city(city))
+    return weather_cache.get(key, CURRENT_WEATHER_TTL, lambda: timed_fetch("weather_current", fetch_weather_forecast, city))
+
+def get_forecast_5day(city):
+    key = ("forecast", normalize_city(city))
+    return weather_cache.get(key, FORECAST_TTL, lambda: timed_fetch("weather_forecast", fetch_forecast_5day, city))
+
+def fetch_weather_forecast(city):
     api_key = os.getenv("OPENWEATHER_API_KEY")
     
     if not api_key:
@@ -15,7 +118,7 @@ def get_weather_forecast(city):
             "units": "metric"
         }
         
-        response = requests.get(base_url, params=params)
+        response = http_client.get(base_url, params=params)
         
         if response.status_code == 200:
             data = response.json()
@@ -38,7 +141,7 @@ def get_weather_forecast(city):
     except Exception as e:
         return None, f"Error fetching weather: {str(e)}"
 
-def get_forecast_5day(city):
+def fetch_forecast_5day(city):
     api_key = os.getenv("OPENWEATHER_API_KEY")
     
     if not api_key:
@@ -52,7 +155,7 @@ def get_forecast_5day(city):
             "units": "metric"
         }
         
-        response = requests.get(base_url, params=params)
+        response = http_client.get(base_url, params=params)
         
         if response.status_code == 200:
             data = response.json()
@@ -72,3 +175,45 @@ def get_forecast_5day(city):
     
     except Exception as e:
         return None, f"Error fetching forecast: {str(e)}"
+
+def _collect(future, done, what):
+    if future in done:
+        return future.result()
+    future.cancel()
+    return None, f"Timed out fetching {what}"
+
+def get_weather_bundle(city, deadline=WEATHER_DEADLINE):
+    """Current weather and forecast for one city, fetched concurrently.
+
+    Returns (weather_info, forecast, error); error describes the current
+    weather call, a failed forecast only leaves forecast as None.
+    """
+    current = _executor.submit(get_weather_forecast, city)
+    forecast = _executor.submit(get_forecast_5day, city)
+    done, _ = wait([current, forecast], timeout=deadline)
+    weather_info, error = _collect(current, done, "weather")
+    forecast_list, _ = _collect(forecast, done, "forecast")
+    return weather_info, forecast_list, error
+
+def get_weather_for_cities(cities, deadline=WEATHER_DEADLINE, include_forecast=True):
+    """Fan out to many cities at once, bounded by MAX_CONCURRENT_REQUESTS.
+
+    Returns {city: (weather_info, forecast, error)} once every call finishes
+    or the shared deadline passes; calls still queued at the deadline are
+    cancelled and reported as timed out.
+    """
+    futures = {}
+    for city in dict.fromkeys(cities):
+        current = _executor.submit(get_weather_forecast, city)
+        forecast = _executor.submit(get_forecast_5day, city) if include_forecast else None
+        futures[city] = (current, forecast)
+
+    pending = [f for pair in futures.values() for f in pair if f is not None]
+    done, _ = wait(pending, timeout=deadline)
+
+    results = {}
+    for city, (current, forecast) in futures.items():
+        weather_info, error = _collect(current, done, "weather")
+        forecast_list = _collect(forecast, done, "forecast")[0] if forecast is not None else None
+        results[city] = (weather_info, forecast_list, error)
+    return results